@@ -1,8 +1,18 @@
+from contextlib import contextmanager
+
 from rich.console import Console
-from rich.prompt import Prompt
 
 console = Console()
 
+# Preset answers for prompts, keyed by a short name for each prompt. When not
+# interactive (e.g. a build service job), every other prompt takes its default.
+answers = {}
+interactive = True
+
+
+class MissingAnswer(Exception):
+    pass
+
 
 def error(message):
     console.print("[b]ERROR:[/b]", message, style="red")
@@ -12,13 +22,67 @@ def warning(message):
     console.print("[b]Warning:[/b]", message, style="orange1")
 
 
-def prompt_input(description, default=None, required=False):
+@contextmanager
+def prompting(key):
+    """Hide the dashboard and mark the wait for input."""
+    from discobuilder.dashboard import dashboard
+    from discobuilder.profiler import waiting
+
+    with dashboard.paused(), waiting("input", key or "prompt"):
+        yield
+
+
+def answer(key, default=None):
+    """Return a preset answer without prompting, or the default."""
+    return answers.get(key, default)
+
+
+def ask(key, description, default=None, choices=None):
+    if key in answers:
+        return str(answers[key])
+    if not interactive:
+        if default is None:
+            raise MissingAnswer(f"No answer given for '{key}' ({description})")
+        return default
+
+    from rich.prompt import Prompt
+
+    kwargs = {"default": default} if default is not None else {}
+    if choices:
+        kwargs["choices"] = choices
+    with prompting(key):
+        return Prompt.ask(description, **kwargs)
+
+
+def confirm(key, description, default=False):
+    if key in answers:
+        return bool(answers[key])
+    if not interactive:
+        return default
+
+    from rich.prompt import Confirm
+
+    with prompting(key):
+        return Confirm.ask(description, default=default)
+
+
+def prompt_input(description, default=None, required=False, key=None):
+    if key in answers:
+        return str(answers[key])
+    if not interactive:
+        if required and not default:
+            raise MissingAnswer(f"No answer given for '{key}' ({description})")
+        return default
+
+    from rich.prompt import Prompt
+
     value = None
-    while value is None or value == "":
-        if not (value := Prompt.ask(description, default=default)):
-            value = default
-        if not required:
-            break
-        if required and not value:
-            error(f"{description} is required")
+    with prompting(key):
+        while value is None or value == "":
+            if not (value := Prompt.ask(description, default=default)):
+                value = default
+            if not required:
+                break
+            if required and not value:
+                error(f"{description} is required")
     return value
@@ -1,8 +1,125 @@
+import argparse
+import atexit
 import sys
 
-from discobuilder.builder import build
+from discobuilder import config
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="discobuilder")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=config.RESUME,
+        help="skip stages already completed by the last interrupted run",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help=(
+            "sample where time goes, write collapsed stacks (to PATH or under "
+            "PROFILE_DIR), and summarize them at exit"
+        ),
+    )
+    parser.add_argument(
+        "--plan",
+        "--dry-run",
+        dest="plan",
+        action="store_true",
+        help="show the stages a build would run, without changing anything",
+    )
+    parser.add_argument(
+        "--product",
+        action="append",
+        choices=["server", "cli", "installer"],
+        help="with --plan, only plan this product (may be repeated)",
+    )
+    parser.add_argument(
+        "--answers",
+        metavar="PATH",
+        help="with --plan, a JSON file of preset prompt answers, as jobs use",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="run as a build service with a job queue and worker pool"
+    )
+    serve_parser.add_argument("--host", default=config.SERVICE_HOST)
+    serve_parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    serve_parser.add_argument(
+        "--socket",
+        default=config.SERVICE_SOCKET,
+        help="listen on this Unix socket instead of a TCP port",
+    )
+    serve_parser.add_argument("--workers", type=int, default=config.SERVICE_WORKERS)
+
+    job_parser = subparsers.add_parser(
+        "job", help="run one build service job (used by the service's workers)"
+    )
+    job_parser.add_argument("job_path")
+
+    cache_parser = subparsers.add_parser(
+        "cache", help="export or import warm repos and caches as one archive"
+    )
+    cache_parser.add_argument("action", choices=["export", "import"])
+    cache_parser.add_argument(
+        "archive", nargs="?", default=config.CACHE_ARCHIVE, help="archive path"
+    )
+
+    stats_parser = subparsers.add_parser(
+        "stats", help="show percentiles of recorded build metrics"
+    )
+    stats_parser.add_argument("--product", help="only show this product's metrics")
+    stats_parser.add_argument("--metric", help="only show this metric")
+    stats_parser.add_argument(
+        "--days", type=float, help="only include the last this many days"
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    if not sys.__stdin__.isatty():
-        raise Exception("This script requires an interactive terminal.")
-    build()
+    args = parse_args()
+    config.RESUME = args.resume
+    if args.profile is not None:
+        from discobuilder import profiler
+
+        profiler.start(args.profile or None)
+        atexit.register(profiler.stop)
+    if args.command == "serve":
+        from discobuilder.service import serve
+
+        serve(args.host, args.port, args.socket, args.workers)
+    elif args.command == "job":
+        from discobuilder.service import run_job
+
+        run_job(args.job_path)
+    elif args.command == "cache":
+        from discobuilder.cache import export_cache, import_cache
+
+        if args.action == "export":
+            export_cache(args.archive)
+        else:
+            import_cache(args.archive)
+    elif args.command == "stats":
+        from discobuilder.metrics import show_stats
+
+        show_stats(args.product, args.days, args.metric)
+    elif args.plan:
+        import json
+
+        import discobuilder
+        from discobuilder.planner import plan
+
+        if args.answers:
+            with open(args.answers, "r") as answers_file:
+                discobuilder.answers.update(json.load(answers_file))
+        plan(args.product or ["server", "cli", "installer"])
+    else:
+        if not sys.__stdin__.isatty():
+            raise Exception("This script requires an interactive terminal.")
+
+        from discobuilder.builder import build
+
+        build()
@@ -1,8 +1,8 @@
-from rich.progress import Progress
-
-from discobuilder import config
+from discobuilder import config, prefetch
 from discobuilder.adapter.git import checkout_ref, clone_repo, pull_repo
-from discobuilder.adapter.subprocess import subprocess_check_call, CalledProcessError
+from discobuilder.adapter.subprocess import CalledProcessError, subprocess_check_call
+from discobuilder.dashboard import dashboard
+from discobuilder.lock import repo_lock
 
 
 class PoetryInstallFailure(Exception):
@@ -10,15 +10,16 @@ class PoetryInstallFailure(Exception):
 
 
 def set_up_chaski():
+    if prefetch.wait(config.CHASKI_GIT_REPO_PATH):
+        return
     clone_repo(config.CHASKI_GIT_URL, config.CHASKI_GIT_REPO_PATH)
     checkout_ref(config.CHASKI_GIT_REPO_PATH, config.CHASKI_GIT_COMMITTISH)
     pull_repo(config.CHASKI_GIT_REPO_PATH)
-    if config.VERBOSE_SUBPROCESSES:
+    if config.VERBOSE_SUBPROCESSES and not dashboard.active:
         poetry_install_chaski()
     else:
-        with Progress() as progress:
+        with dashboard.status("Waiting on `poetry install` for chaski"):
             poetry_install_chaski()
-            progress.add_task("Waiting on `poetry install` for chaski", total=None)
 
 
 def poetry_install_chaski():
@@ -36,7 +37,8 @@ def poetry_install_chaski():
         else {}
     )
     try:
-        subprocess_check_call(command, **kwargs)
+        with repo_lock(config.CHASKI_GIT_REPO_PATH):
+            subprocess_check_call(command, **kwargs)
     except CalledProcessError:
         raise PoetryInstallFailure(
             f"Failed to `poetry install` in {config.CHASKI_GIT_REPO_PATH}"
@@ -44,29 +46,30 @@ def poetry_install_chaski():
 
 
 def run_chaski(distgit_path):
-    subprocess_check_call(
-        [
-            "python3",
-            "-m",
-            "poetry",
-            "run",
-            "-C",
-            config.CHASKI_GIT_REPO_PATH,
-            "chaski",
-            "update-remote-sources",
-            distgit_path,
-        ]
-    )
-    subprocess_check_call(
-        [
-            "python3",
-            "-m",
-            "poetry",
-            "run",
-            "-C",
-            config.CHASKI_GIT_REPO_PATH,
-            "chaski",
-            "update-rust-deps",
-            distgit_path,
-        ]
-    )
+    with repo_lock(config.CHASKI_GIT_REPO_PATH, exclusive=False):
+        subprocess_check_call(
+            [
+                "python3",
+                "-m",
+                "poetry",
+                "run",
+                "-C",
+                config.CHASKI_GIT_REPO_PATH,
+                "chaski",
+                "update-remote-sources",
+                distgit_path,
+            ]
+        )
+        subprocess_check_call(
+            [
+                "python3",
+                "-m",
+                "poetry",
+                "run",
+                "-C",
+                config.CHASKI_GIT_REPO_PATH,
+                "chaski",
+                "update-rust-deps",
+                distgit_path,
+            ]
+        )
@@ -1,11 +1,23 @@
-from os import path
+import os
+import shutil
+import tempfile
+from os import environ, path
 from pathlib import Path
 
-from rich.prompt import Confirm, Prompt
 from rich.table import Table
 
-from discobuilder import config, console, prompt_input, warning
+from discobuilder import (
+    answer,
+    ask,
+    config,
+    confirm,
+    console,
+    prompt_input,
+    warning,
+)
+from discobuilder.adapter.kerberos import requires_ticket
 from discobuilder.adapter.subprocess import subprocess_call, subprocess_run
+from discobuilder.lock import repo_lock
 
 
 class GitCloneFailure(Exception):
@@ -28,33 +40,91 @@ class GitPullFailure(Exception):
     pass
 
 
+class GitCommitFailure(Exception):
+    pass
+
+
+class GitListRemoteFailure(Exception):
+    pass
+
+
 class NotAGitRepo(Exception):
     pass
 
 
-def git_config_add(key, value):
-    subprocess_call(
-        ["git", "config", "--global", "--add", key, value],
-        stdout=config.STDOUT,
-        stderr=config.STDERR,
+class GitConfigFailure(Exception):
+    pass
+
+
+def global_git_config_path():
+    return Path(environ.get("GIT_CONFIG_GLOBAL", Path.home() / ".gitconfig"))
+
+
+def get_global_git_config():
+    """Read every global git config entry with a single `git config` call."""
+    git_config = subprocess_run(
+        ["git", "config", "--global", "--null", "--list"],
+        capture_output=True,
     )
+    entries = {}
+    for entry in git_config.stdout.decode().split("\0"):
+        if entry:
+            key, _, value = entry.partition("\n")
+            entries.setdefault(key, []).append(value)
+    return entries
+
+
+def set_global_git_config(settings):
+    """
+    Make the global git config hold exactly one value for each given key.
+
+    Only keys whose current values differ are written, including keys that
+    earlier `--add` calls left with duplicate values. Changes are made to a
+    copy of the config file that then atomically replaces the original.
+    """
+    current = get_global_git_config()
+    changes = {
+        key: value for key, value in settings.items() if current.get(key) != [value]
+    }
+    if not changes:
+        return changes
+
+    config_path = global_git_config_path()
+    fd, temp_path = tempfile.mkstemp(dir=config_path.parent, prefix=".gitconfig.")
+    os.close(fd)
+    try:
+        if config_path.exists():
+            shutil.copy2(config_path, temp_path)
+        for key, value in changes.items():
+            success = subprocess_call(
+                ["git", "config", "--file", temp_path, "--replace-all", key, value],
+                stdout=config.STDOUT,
+                stderr=config.STDERR,
+            )
+            if success != 0:
+                raise GitConfigFailure(f"Failed to set git config {key}")
+        os.replace(temp_path, config_path)
+    finally:
+        if path.exists(temp_path):
+            os.unlink(temp_path)
+    return changes
 
 
 def configure_git():
-    config.name = prompt_input("git user name", config.GIT_NAME, True)
-    config.email = prompt_input("git user email", config.GIT_EMAIL, True)
+    config.name = prompt_input("git user name", config.GIT_NAME, True, "git_name")
+    config.email = prompt_input("git user email", config.GIT_EMAIL, True, "git_email")
     config.signingkey = prompt_input(
-        "git user signingkey", config.GIT_SIGNING_KEY, False
+        "git user signingkey", config.GIT_SIGNING_KEY, False, "git_signing_key"
     )
 
-    git_config_add("user.name", config.name)
-    git_config_add("user.email", config.email)
+    settings = {"user.name": config.name, "user.email": config.email}
     if config.signingkey:
-        git_config_add("user.signingkey", config.signingkey)
-        git_config_add("commit.gpgsign", "true")
+        settings["user.signingkey"] = config.signingkey
+        settings["commit.gpgsign"] = "true"
         warning("Don't forget to import your GPG signing key!")
     else:
-        git_config_add("commit.gpgsign", "false")
+        settings["commit.gpgsign"] = "false"
+    set_global_git_config(settings)
 
 
 def is_git_repo(local_path):
@@ -69,49 +139,108 @@ def is_git_repo(local_path):
     )
 
 
+def head_commit(local_path):
+    git_rev_parse = subprocess_run(
+        ["git", "rev-parse", "HEAD"], cwd=local_path, capture_output=True
+    )
+    return git_rev_parse.stdout.decode().strip() or None
+
+
+def current_branch(local_path):
+    git_branch = subprocess_run(
+        ["git", "branch", "--show-current"], cwd=local_path, capture_output=True
+    )
+    return git_branch.stdout.decode().strip() or None
+
+
+def has_commit(local_path, committish):
+    """Check whether the current HEAD contains the given commit."""
+    return (
+        subprocess_call(
+            ["git", "merge-base", "--is-ancestor", committish, "HEAD"],
+            cwd=local_path,
+            stdout=config.STDOUT,
+            stderr=config.STDERR,
+        )
+        == 0
+    )
+
+
+def list_remote_tags(origin_url):
+    """List tag names on a remote without cloning it."""
+    git_ls_remote = subprocess_run(
+        ["git", "ls-remote", "--tags", "--refs", origin_url],
+        capture_output=True,
+        env={**environ, "GIT_TERMINAL_PROMPT": "0"},
+    )
+    if git_ls_remote.returncode != 0:
+        raise GitListRemoteFailure(f"Failed to list tags for {origin_url}")
+    return [
+        line.split("refs/tags/", 1)[1]
+        for line in git_ls_remote.stdout.decode().splitlines()
+        if "refs/tags/" in line
+    ]
+
+
+@requires_ticket
 def clone_repo(origin_url, local_path):
-    if path.isdir(local_path):
-        warning(f"Directory already exists at {local_path}.")
+    with repo_lock(local_path):
+        if path.isdir(local_path):
+            warning(f"Directory already exists at {local_path}.")
+            if not is_git_repo(local_path):
+                raise NotAGitRepo(f"{local_path} is not in a git repo work tree")
+            return False
+        # remote commands may ask to confirm a host key or for a password
+        clone = ["git", "clone", origin_url, local_path]
+        if subprocess_call(clone, interactive=True) != 0:
+            raise GitCloneFailure(f"Failed to clone {origin_url} to {local_path}")
+        return True
+
+
+@requires_ticket
+def checkout_ref(local_path, ref, fetch=True):
+    with repo_lock(local_path):
         if not is_git_repo(local_path):
             raise NotAGitRepo(f"{local_path} is not in a git repo work tree")
-        return False
-    if subprocess_call(["git", "clone", origin_url, local_path]) != 0:
-        raise GitCloneFailure(f"Failed to clone {origin_url} to {local_path}")
-    return True
-
-
-def checkout_ref(local_path, ref):
-    if not is_git_repo(local_path):
-        raise NotAGitRepo(f"{local_path} is not in a git repo work tree")
-    if subprocess_call(["git", "fetch", "--all"], cwd=local_path) != 0:
-        raise GitFetchAllFailure(f"Failed to fetch all for repo at {local_path}")
-    if subprocess_call(["git", "checkout", ref], cwd=local_path) != 0:
-        raise GitCheckoutFailure(
-            f"Failed to checkout ref {ref} for repo at {local_path}"
-        )
+        fetch_all = ["git", "fetch", "--all"]
+        if fetch and subprocess_call(fetch_all, cwd=local_path, interactive=True) != 0:
+            raise GitFetchAllFailure(f"Failed to fetch all for repo at {local_path}")
+        if subprocess_call(["git", "checkout", ref], cwd=local_path) != 0:
+            raise GitCheckoutFailure(
+                f"Failed to checkout ref {ref} for repo at {local_path}"
+            )
 
 
-def pull_repo(local_path):
-    if not is_git_repo(local_path):
-        raise NotAGitRepo(f"{local_path} is not in a git repo work tree")
-    if subprocess_call(["git", "pull"], cwd=local_path) != 0:
-        raise GitPullFailure(f"Failed to pull repo at {local_path}")
+@requires_ticket
+def pull_repo(local_path, fetch=True):
+    """Update the current branch, or only fast-forward it if already fetched."""
+    with repo_lock(local_path):
+        if not is_git_repo(local_path):
+            raise NotAGitRepo(f"{local_path} is not in a git repo work tree")
+        args = (
+            ["git", "pull"] if fetch else ["git", "merge", "--ff-only", "@{upstream}"]
+        )
+        if subprocess_call(args, cwd=local_path, interactive=fetch) != 0:
+            raise GitPullFailure(f"Failed to pull repo at {local_path}")
 
 
+@requires_ticket
 def get_existing_release_branch(
     repo_path, branch_prefix_filter="", default_branch_name=None
 ):
-    subprocess_call(
-        ["git", "fetch", "-p", "--all"],
-        stdout=config.STDOUT,
-        stderr=config.STDERR,
-        cwd=repo_path,
-    )
-    git_branch = subprocess_run(
-        ["git", "branch", "--list", "-a", "--color=never"],
-        cwd=repo_path,
-        capture_output=True,
-    )
+    with repo_lock(repo_path, exclusive=False):
+        subprocess_call(
+            ["git", "fetch", "-p", "--all"],
+            stdout=config.STDOUT,
+            stderr=config.STDERR,
+            cwd=repo_path,
+            interactive=True,
+        )
+        git_branch = subprocess_run(
+            ["git", "branch", "--list", "-a", "--color=never"],
+            cwd=repo_path,
+            capture_output=True,
+        )
     branches = dict(
         (
             (str(num), name)
@@ -132,79 +261,96 @@ def get_existing_release_branch(
         else None
     )
 
+    if preset_branch := answer("release_branch"):
+        if preset_branch not in branches.values():
+            raise GitCheckoutFailure(f"No release branch named {preset_branch}")
+        return preset_branch
+
     table = Table("#", "branch ref")
     for num, name in branches.items():
         table.add_row(num, name)
 
     console.print(table)
-    kwargs = {"default": default_choice} if default_choice is not None else {}
-    base_branch_key = Prompt.ask(
+    base_branch_key = ask(
+        "release_branch_number",
         "Which # release branch from the table above?",
-        choices=branches.keys(),
-        **kwargs,
+        default=default_choice,
+        choices=list(branches.keys()),
     )
     return branches[base_branch_key]
 
 
 def new_private_branch(base_branch, repo_path):
-    success = subprocess_call(
-        ["git", "checkout", base_branch],
-        cwd=repo_path,
-        stdout=config.STDOUT,
-        stderr=config.STDERR,
-    )
-    if success != 0:
-        raise GitCheckoutFailure(f"Failed `git checkout {base_branch}`")
-    success = subprocess_call(
-        ["git", "checkout", "-B", config.PRIVATE_BRANCH_NAME],
-        cwd=repo_path,
-    )
-    if success != 0:
-        raise GitCheckoutBFailure(
-            f"Failed `git checkout -B {config.PRIVATE_BRANCH_NAME}`"
+    with repo_lock(repo_path):
+        success = subprocess_call(
+            ["git", "checkout", base_branch],
+            cwd=repo_path,
+            stdout=config.STDOUT,
+            stderr=config.STDERR,
         )
+        if success != 0:
+            raise GitCheckoutFailure(f"Failed `git checkout {base_branch}`")
+        success = subprocess_call(
+            ["git", "checkout", "-B", config.PRIVATE_BRANCH_NAME],
+            cwd=repo_path,
+        )
+        if success != 0:
+            raise GitCheckoutBFailure(
+                f"Failed `git checkout -B {config.PRIVATE_BRANCH_NAME}`"
+            )
 
 
 def add(repo_path, file_path):
-    subprocess_call(["git", "add", str(file_path)], cwd=repo_path)
+    with repo_lock(repo_path):
+        subprocess_call(["git", "add", str(file_path)], cwd=repo_path)
 
 
 def commit(repo_path, and_push=True, default_commit_message="build: update versions"):
+    """Commit every change, optionally push, and return True if the commit worked."""
     # TODO check if the repo is dirty before trying to commit
-    subprocess_call(["git", "diff", "HEAD"], cwd=repo_path)
+    with repo_lock(repo_path, exclusive=False):
+        subprocess_call(["git", "diff", "HEAD"], cwd=repo_path, interactive=True)
     dir_name = Path(repo_path).name
     commit_message = prompt_input(
-        f"git commit message for {dir_name}", default=default_commit_message
-    )
-    success = subprocess_call(
-        [
-            "git",
-            "commit",
-            "-am",
-            commit_message,
-        ],
-        cwd=repo_path,
+        f"git commit message for {dir_name}",
+        default=default_commit_message,
+        key="commit_message",
     )
+    with repo_lock(repo_path):
+        success = subprocess_call(
+            [
+                "git",
+                "commit",
+                "-am",
+                commit_message,
+            ],
+            cwd=repo_path,
+            interactive=True,  # signing may ask for a passphrase
+        )
     if not and_push:
-        return
-    if success != 0 and not Confirm.ask(
-        "Failed git commit. Push anyway?", default=True
+        return success == 0
+    if success != 0 and not confirm(
+        "push_anyway", "Failed git commit. Push anyway?", default=True
     ):
-        return
+        return False
     push(repo_path)
+    return success == 0
 
 
+@requires_ticket
 def push(repo_path):
-    success = subprocess_call(
-        [
-            "git",
-            "push",
-            "--force",
-            "--set-upstream",
-            "origin",
-            config.PRIVATE_BRANCH_NAME,
-        ],
-        cwd=repo_path,
-    )
+    with repo_lock(repo_path, exclusive=False):
+        success = subprocess_call(
+            [
+                "git",
+                "push",
+                "--force",
+                "--set-upstream",
+                "origin",
+                config.PRIVATE_BRANCH_NAME,
+            ],
+            cwd=repo_path,
+            interactive=True,
+        )
     if success != 0:
         raise Exception("Failed git push")
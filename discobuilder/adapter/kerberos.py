@@ -1,9 +1,68 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import NamedTuple
+
+import discobuilder
 from discobuilder import config, prompt_input, warning
-from discobuilder.adapter.subprocess import subprocess_call
+from discobuilder.adapter.subprocess import subprocess_call, subprocess_run
+
+KLIST_TIME_FORMATS = (
+    "%m/%d/%y %H:%M:%S",
+    "%m/%d/%Y %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%d/%m/%y %H:%M:%S",
+)
+
+
+class TicketTimes(NamedTuple):
+    expires: datetime
+    renew_until: datetime | None
+
+
+def parse_klist_time(value):
+    for time_format in KLIST_TIME_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), time_format)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_klist(output):
+    """Find the ticket-granting ticket's expiry and renewal limit in `klist` output."""
+    lines = output.splitlines()
+    for line_number, line in enumerate(lines):
+        if "krbtgt/" not in line:
+            continue
+        columns = [column for column in line.split("  ") if column.strip()]
+        if len(columns) < 3 or not (expires := parse_klist_time(columns[1])):
+            continue
+        renew_until = None
+        if line_number + 1 < len(lines):
+            next_line = lines[line_number + 1].strip()
+            if next_line.startswith("renew until"):
+                renew_until = parse_klist_time(next_line.removeprefix("renew until"))
+        return TicketTimes(expires, renew_until)
+    return None
+
+
+def get_ticket_times(klist=None):
+    """Read the ticket-granting ticket's lifetime from the credential cache."""
+    klist_run = subprocess_run(
+        [klist or config.KLIST_COMMAND],
+        capture_output=True,
+        env={**os.environ, "LC_ALL": "C", "LANG": "C"},
+        show_command=False,
+    )
+    if klist_run.returncode != 0:
+        return None
+    return parse_klist(klist_run.stdout.decode())
 
 
 def kinit():
-    args = ["klist", "-s"]
+    args = [config.KLIST_COMMAND, "-s"]
     if subprocess_call(args) == 0:
         warning("Skipping kinit because a ticket is already present.")
         return
@@ -11,6 +70,119 @@ def kinit():
     success = False
     while not success:
         config.KERBEROS_USERNAME = prompt_input(
-            "kerberos username", config.KERBEROS_USERNAME, True
+            "kerberos username", config.KERBEROS_USERNAME, True, "kerberos_username"
+        )
+        success = (
+            subprocess_call(
+                [config.KINIT_COMMAND, config.KERBEROS_USERNAME], interactive=True
+            )
+            == 0
+        )
+
+
+class TicketManager:
+    """
+    Keep the Kerberos ticket alive for the whole session.
+
+    A background thread reads the ticket's expiry from the credential cache and
+    runs `kinit -R` shortly before it expires. Remote operations call
+    `wait_for_ticket` first: background threads and non-interactive runs (e.g.
+    service jobs) wait until a ticket is usable again, and an interactive main
+    thread asks the user to `kinit` when renewal is no longer possible.
+    """
+
+    def __init__(self, klist=None, kinit=None, renew_before=None, poll_interval=None):
+        self.klist = klist or config.KLIST_COMMAND
+        self.kinit = kinit or config.KINIT_COMMAND
+        self.renew_before = timedelta(
+            seconds=renew_before or config.KERBEROS_RENEW_BEFORE_SECONDS
         )
-        success = subprocess_call(["kinit", config.KERBEROS_USERNAME]) == 0
+        self.poll_interval = poll_interval or config.KERBEROS_POLL_SECONDS
+        self.ticket_ready = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def renew(self):
+        return (
+            subprocess_call(
+                [self.kinit, "-R"],
+                stdout=config.STDOUT,
+                stderr=config.STDERR,
+                show_command=False,
+            )
+            == 0
+        )
+
+    def refresh(self, now=None):
+        """Renew the ticket if it expires soon, and return True if it is usable."""
+        with self.lock:
+            now = now or datetime.now()
+            ticket_times = get_ticket_times(self.klist)
+            if ticket_times and ticket_times.expires - now > self.renew_before:
+                self.ticket_ready.set()
+                return True
+            renewable = (
+                ticket_times
+                and ticket_times.renew_until
+                and ticket_times.renew_until > now
+            )
+            if renewable and self.renew():
+                self.ticket_ready.set()
+                return True
+            if ticket_times and ticket_times.expires > now:
+                # still valid for now, but the user must kinit before it expires
+                self.ticket_ready.set()
+                return True
+            self.ticket_ready.clear()
+            return False
+
+    def watch(self):
+        while not self.stopping.wait(self.poll_interval):
+            self.refresh()
+
+    def start(self):
+        self.refresh()
+        self.thread = threading.Thread(
+            target=self.watch, name="kerberos-ticket-manager", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()
+
+    def wait_for_ticket(self):
+        if self.ticket_ready.is_set() or self.refresh():
+            return
+        main_thread = threading.current_thread() is threading.main_thread()
+        if not (main_thread and discobuilder.interactive):
+            self.ticket_ready.wait()
+            return
+        warning("The Kerberos ticket expired and could not be renewed.")
+        while not self.refresh():
+            kinit()
+
+
+ticket_manager = None
+
+
+def start_ticket_manager():
+    global ticket_manager
+    if ticket_manager is None:
+        ticket_manager = TicketManager()
+        ticket_manager.start()
+    return ticket_manager
+
+
+def requires_ticket(function):
+    """Pause a remote operation until the ticket manager has a usable ticket."""
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if ticket_manager:
+            ticket_manager.wait_for_ticket()
+        return function(*args, **kwargs)
+
+    return wrapper
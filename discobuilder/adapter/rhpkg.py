@@ -1,9 +1,57 @@
-from discobuilder import config
-from discobuilder.adapter.subprocess import subprocess_call
+import os
+import re
+import time
 
+from discobuilder import config, metrics
+from discobuilder.adapter.kerberos import requires_ticket
+from discobuilder.adapter.subprocess import subprocess_call, subprocess_tee
 
+
+class RhpkgImportFailure(Exception):
+    pass
+
+
+def get_task_id(output):
+    """Find the brew task ID in `rhpkg` output, if any."""
+    if match := re.search(r"^Created task:\s*(\d+)", output, re.MULTILINE):
+        return match.group(1)
+    return None
+
+
+class TaskTimer:
+    """
+    Time a brew task's queue and run phases from `rhpkg` output as it arrives.
+
+    rhpkg watches the task it created and prints its state changes, e.g.
+    "123 build (...): free -> open (builder)" and later "... open -> closed".
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.task_id = None
+        self.created = self.opened = None
+
+    def __call__(self, line):
+        now = time.monotonic()
+        if not self.task_id:
+            if task_id := get_task_id(line):
+                self.task_id, self.created = task_id, now
+            return
+        if not (match := re.match(rf"^{self.task_id} .*-> (\w+)", line.strip())):
+            return
+        state = match.group(1)
+        if state == "open" and not self.opened:
+            self.opened = now
+            metrics.record("brew_queue_seconds", now - self.created, task=self.kind)
+        elif state in ("closed", "failed", "canceled") and self.opened:
+            metrics.record(
+                "brew_run_seconds", now - self.opened, task=self.kind, outcome=state
+            )
+
+
+@requires_ticket
 def build(repo_path, target: str = None, release: str = None, scratch=True):
-    """Calls `rhpkg build` for an RPM."""
+    """Calls `rhpkg build` for an RPM and returns the brew task ID."""
     args = ["rhpkg"]
     if release:
         args += ["--release", release]
@@ -12,24 +60,39 @@ def build(repo_path, target: str = None, release: str = None, scratch=True):
         args += ["--target", target]
     if scratch:
         args += ["--scratch"]
-    subprocess_call(args, cwd=repo_path)
+    _, output = subprocess_tee(
+        args, cwd=repo_path, on_line=TaskTimer("build"), interactive=True
+    )
+    return get_task_id(output)
 
 
+@requires_ticket
 def container_build(repo_path, target: str = None, scratch=True):
-    """Calls `rhpkg container-build` for an OCI container image."""
+    """Calls `rhpkg container-build` for an OCI image and returns the brew task ID."""
     args = ["rhpkg", "container-build"]
     if target:
         args += ["--target", target]
     if scratch:
         args += ["--scratch"]
-    subprocess_call(args, cwd=repo_path)
+    _, output = subprocess_tee(
+        args, cwd=repo_path, on_line=TaskTimer("container-build"), interactive=True
+    )
+    return get_task_id(output)
 
 
+@requires_ticket
 def srpm_import(repo_path, srpm_path):
     """Calls `rhpkg import` to update `sources` file with SRPM info."""
-    subprocess_call(
+    started = time.monotonic()
+    success = subprocess_call(
         ["rhpkg", "import", srpm_path],
         cwd=repo_path,
         stdout=config.STDOUT,
         stderr=config.STDERR,
+        interactive=True,
     )
+    outcome = "succeeded" if success == 0 else "failed"
+    metrics.record("import_seconds", time.monotonic() - started, outcome=outcome)
+    metrics.record("srpm_bytes", os.path.getsize(srpm_path), outcome=outcome)
+    if success != 0:
+        raise RhpkgImportFailure(f"Failed `rhpkg import {srpm_path}`")
@@ -1,36 +1,133 @@
+import shutil
+import time
 from pathlib import Path
 
-from discobuilder.adapter.subprocess import subprocess_check_call
 from discobuilder import config
+from discobuilder.adapter.subprocess import subprocess_check_call, subprocess_run
+from discobuilder.lock import rpmbuild_lock
+
+# remove other runs' rpmbuild trees once they have been left alone this long
+STALE_TREE_SECONDS = 7 * 24 * 60 * 60
+
+
+def get_rpmbuild_path() -> Path:
+    return Path.home() / "rpmbuild"
+
+
+def get_topdir() -> Path:
+    """This run's own rpmbuild tree, so concurrent runs never share SRPMs."""
+    return get_rpmbuild_path() / "runs" / config.PRIVATE_BRANCH_NAME
 
 
 def get_srpms_path() -> Path:
-    return Path.home() / "rpmbuild" / "SRPMS"
+    return get_topdir() / "SRPMS"
+
+
+def get_sources_path() -> Path:
+    """Downloaded sources, shared by every run as a cache."""
+    return get_rpmbuild_path() / "SOURCES"
+
+
+def rpm_macros():
+    return [
+        "--define",
+        f"_topdir {get_topdir()}",
+        "--define",
+        f"_sourcedir {get_sources_path()}",
+    ]
 
 
 def purge_rpmbuild_tree():
+    """Start this run's rpmbuild tree empty, keeping the shared sources."""
     subprocess_check_call(["rpmdev-setuptree"])
-    subprocess_check_call(
-        [
-            "find",
-            Path.home() / "rpmbuild",
-            "-type",
-            "f",
-            "-printf",
-            "deleted '%p'\\n",
-            "-delete",
-        ],
-    )
+    topdir = get_topdir()
+    shutil.rmtree(topdir, ignore_errors=True)
+    for name in ("BUILD", "BUILDROOT", "RPMS", "SPECS", "SRPMS"):
+        (topdir / name).mkdir(parents=True)
+    get_sources_path().mkdir(parents=True, exist_ok=True)
+
+    for tree in (get_rpmbuild_path() / "runs").iterdir():
+        if time.time() - tree.stat().st_mtime > STALE_TREE_SECONDS:
+            shutil.rmtree(tree, ignore_errors=True)
 
 
 def build_source_rpm(specfile_path: Path):
-    subprocess_check_call(
-        ["spectool", "--sourcedir", "--get-files", specfile_path],
-        stdout=config.STDOUT,
-        stderr=config.STDERR,
+    # spectool skips sources that are already downloaded
+    with rpmbuild_lock():
+        subprocess_check_call(
+            ["spectool", *rpm_macros(), "--sourcedir", "--get-files", specfile_path],
+            stdout=config.STDOUT,
+            stderr=config.STDERR,
+        )
+    with rpmbuild_lock(exclusive=False):
+        subprocess_check_call(
+            ["rpmbuild", *rpm_macros(), "-bs", specfile_path, "--verbose", "--clean"],
+            stdout=config.STDOUT,
+            stderr=config.STDERR,
+        )
+
+
+def find_source_rpm(package, version):
+    """Find an SRPM built for the given package and version, if there is one."""
+    # naively expect exactly one match
+    return next(iter(get_srpms_path().glob(f"{package}-{version}-*.src.rpm")), None)
+
+
+def require_source_rpm(package, version):
+    if srpm := find_source_rpm(package, version):
+        return srpm
+    raise Exception(
+        f"No SRPMs found? ({get_srpms_path()}/{package}-{version}-*.src.rpm)"
     )
-    subprocess_check_call(
-        ["rpmbuild", "-bs", specfile_path, "--verbose", "--clean"],
-        stdout=config.STDOUT,
-        stderr=config.STDERR,
+
+
+class RpmQueryFailure(Exception):
+    pass
+
+
+def rpm_query(args):
+    """Run a read-only rpm/rpmspec query quietly and return its stdout lines."""
+    query = subprocess_run(args, capture_output=True, text=True, show_command=False)
+    if query.returncode != 0:
+        detail = (query.stderr.strip().splitlines() or ["no output"])[-1]
+        raise RpmQueryFailure(f"`{' '.join(map(str, args))}` failed: {detail}")
+    return query.stdout.splitlines()
+
+
+def parse_spec(specfile_path: Path):
+    return rpm_query(["rpmspec", "--parse", specfile_path])
+
+
+def query_spec_nvr(specfile_path: Path):
+    """Return the (name, version, release) the spec's SRPM should have."""
+    lines = rpm_query(
+        [
+            "rpmspec",
+            "-q",
+            "--srpm",
+            "--queryformat",
+            "%{NAME} %{VERSION} %{RELEASE}\\n",
+            specfile_path,
+        ]
+    )
+    return tuple(lines[0].split())
+
+
+def query_srpm_nvr(srpm_path: Path):
+    lines = rpm_query(
+        ["rpm", "-qp", "--queryformat", "%{NAME} %{VERSION} %{RELEASE}\\n", srpm_path]
     )
+    return tuple(lines[0].split())
+
+
+def list_spec_sources(specfile_path: Path):
+    """Return the file names of the spec's Source entries."""
+    return [
+        line.split(":", 1)[1].strip().rsplit("/", 1)[-1]
+        for line in rpm_query(["spectool", "--list-files", "--sources", specfile_path])
+        if ":" in line
+    ]
+
+
+def list_srpm_files(srpm_path: Path):
+    return rpm_query(["rpm", "-qpl", srpm_path])
@@ -1,6 +1,20 @@
-from subprocess import call, run, check_call
+import sys
+from contextlib import nullcontext
+from os import path
+from subprocess import (
+    DEVNULL,
+    PIPE,
+    STDOUT,
+    CalledProcessError,
+    Popen,
+    call,
+    check_call,
+    run,
+)
 
 from discobuilder import config, console
+from discobuilder.dashboard import dashboard
+from discobuilder.profiler import waiting
 
 
 def subprocess_call(*args, **kwargs):
@@ -18,13 +32,93 @@ def subprocess_check_call(*args, **kwargs):
     return subprocess_command(check_call, *args, **kwargs)
 
 
+def subprocess_popen(*args, **kwargs):
+    """Start command and return its Popen instance without waiting for it."""
+    return subprocess_command(Popen, *args, **kwargs)
+
+
 def subprocess_command(command, *args, **kwargs):
-    if config.SHOW_COMMANDS:
+    """
+    Execute command, optionally showing it first.
+
+    Pass `interactive=True` for commands that need the terminal (e.g. to ask
+    for a password); the dashboard is hidden while they run. Otherwise, while
+    the dashboard runs, output of `call`/`check_call` is streamed into it.
+    """
+    interactive = kwargs.pop("interactive", False)
+    if kwargs.pop("show_command", config.SHOW_COMMANDS):
         console.print(f"# {command.__name__}", style="bright_black")
         for key, value in kwargs.items():
             console.print(f"# {key}: {value}", style="bright_black")
         if len(args) > 1:
-            console.print(f'# {" ".join([str(arg) for arg in args[1:]])}')
+            console.print(f"# {' '.join([str(arg) for arg in args[1:]])}")
         if args:
-            console.print(f'[green]$[/green] {" ".join([str(arg) for arg in args[0]])}')
-    return command(*args, **kwargs)
+            console.print(f"[green]$[/green] {' '.join([str(arg) for arg in args[0]])}")
+    if command is Popen:
+        return command(*args, **kwargs)
+    with waiting("subprocess", command_name(args[0])):
+        if dashboard.active and interactive:
+            with dashboard.paused():
+                return command(*args, **kwargs)
+        if (
+            dashboard.active
+            and command in (call, check_call)
+            and kwargs.get("stdout") in (None, DEVNULL, PIPE)
+        ):
+            return subprocess_stream(command, *args, **kwargs)
+        return command(*args, **kwargs)
+
+
+def command_name(args):
+    """Name a command for profiles, e.g. "git" or "poetry" for `python3 -m poetry`."""
+    if isinstance(args, (str, bytes)):
+        args = str(args).split()
+    name = path.basename(str(args[0]))
+    if name.startswith("python") and len(args) > 2 and args[1] == "-m":
+        return str(args[2])
+    return name
+
+
+def subprocess_stream(command, args, **kwargs):
+    """
+    Run a `call` or `check_call` with its output streamed to the dashboard.
+
+    Output that would have reached the terminal (or been piped, when verbose)
+    is also printed above the dashboard; output that would have been thrown
+    away only shows in the dashboard.
+    """
+    echo = kwargs.get("stdout") is None or config.VERBOSE_SUBPROCESSES
+    kwargs.update({"stdout": PIPE, "stderr": STDOUT, "text": True, "errors": "replace"})
+    with Popen(args, **kwargs) as process:
+        for line in process.stdout:
+            dashboard.output(line, echo=echo)
+    if command is check_call and process.returncode != 0:
+        raise CalledProcessError(process.returncode, args)
+    return process.returncode
+
+
+def subprocess_tee(*args, on_line=None, interactive=False, **kwargs):
+    """
+    Execute command, echo its output as it arrives, and return (status, output).
+
+    If given, `on_line` is also called with each line as soon as it arrives.
+    With `interactive=True`, the dashboard is hidden and output goes straight
+    to the terminal, so anything the command asks for stays visible.
+    """
+    kwargs.update({"stdout": PIPE, "stderr": STDOUT, "text": True})
+    lines = []
+    with (
+        waiting("subprocess", command_name(args[0])),
+        dashboard.paused() if interactive else nullcontext(),
+        subprocess_popen(*args, **kwargs) as process,
+    ):
+        for line in process.stdout:
+            if interactive:
+                sys.stdout.write(line)
+                sys.stdout.flush()
+            else:
+                dashboard.output(line)
+            lines.append(line)
+            if on_line:
+                on_line(line)
+    return process.returncode, "".join(lines)
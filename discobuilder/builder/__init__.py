@@ -1,22 +1,57 @@
-from rich.prompt import Confirm, Prompt
+from importlib import import_module
 
-from discobuilder.adapter.git import configure_git
-from discobuilder.adapter.kerberos import kinit
-from discobuilder.builder.cli import build_cli  # noqa: F401
-from discobuilder.builder.installer import build_installer  # noqa: F401
-from discobuilder.builder.server import build_server  # noqa: F401
+from discobuilder import ask, config, confirm
+
+# Each product's pipeline is imported only when chosen, so its adapters and
+# their dependencies (requests, yaml, ...) stay out of startup.
+BUILDERS = {
+    "server": ("discobuilder.builder.server", "build_server"),
+    "cli": ("discobuilder.builder.cli", "build_cli"),
+    "installer": ("discobuilder.builder.installer", "build_installer"),
+}
+
+
+def get_builder(name):
+    module_name, function_name = BUILDERS[name]
+    return getattr(import_module(module_name), function_name)
 
 
 def build():
+    from discobuilder import prefetch
+
+    prefetch.start()
+
+    from discobuilder.adapter.git import configure_git
+    from discobuilder.adapter.kerberos import kinit, start_ticket_manager
+
     configure_git()
     kinit()
+    prefetch.credentials_ready.set()
+    start_ticket_manager()
+
+    if config.PREFLIGHT:
+        from discobuilder.preflight import preflight
+
+        if not preflight() and not confirm(
+            "ignore_preflight",
+            "Some preflight checks failed. Continue anyway?",
+            default=False,
+        ):
+            return
+
+    from discobuilder.dashboard import dashboard
 
-    while True:
-        choice = Prompt.ask(
-            "What do you want to build?",
-            choices=["server", "cli", "installer"],
-            default="server",
-        )
-        eval(f"build_{choice}()")
-        if not Confirm.ask("Want to build something else?"):
-            break
+    dashboard.start()
+    try:
+        while True:
+            choice = ask(
+                "product",
+                "What do you want to build?",
+                choices=list(BUILDERS),
+                default="server",
+            )
+            get_builder(choice)()
+            if not confirm("build_again", "Want to build something else?"):
+                break
+    finally:
+        dashboard.stop()
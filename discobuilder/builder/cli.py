@@ -1,23 +1,29 @@
 # TODO: Refactor/deduplicate a lot of similar code between this and ./installer.py.
-from textwrap import dedent
-
 import re
+from os import path
 from pathlib import Path
+from textwrap import dedent
 
-from rich.prompt import Confirm, Prompt
-
-from discobuilder import config, console, warning
+from discobuilder import answer, ask, config, confirm, console, prefetch, warning
+from discobuilder.adapter import rhpkg, rpmbuild
 from discobuilder.adapter.git import (
+    GitCommitFailure,
     GitPullFailure,
     checkout_ref,
     clone_repo,
     commit,
+    current_branch,
     get_existing_release_branch,
+    has_commit,
+    head_commit,
+    is_git_repo,
     new_private_branch,
     pull_repo,
     push,
 )
-from discobuilder.adapter import rhpkg, rpmbuild
+from discobuilder.checkpoint import Checkpoint, file_sha256
+from discobuilder.lock import repo_lock
+from discobuilder.validation import finish_validation, start_validation
 
 
 def update_specfile_version(specfile_path):
@@ -34,7 +40,9 @@ def update_specfile_version(specfile_path):
         raise Exception("Version not found in spec file!")
 
     old_version = version_line_match.group(2)
-    new_version = Prompt.ask("New version for spec file", default=old_version)
+    new_version = ask(
+        "version.version", "New version for spec file", default=old_version
+    )
     if new_version == old_version:
         return False
 
@@ -46,73 +54,179 @@ def update_specfile_version(specfile_path):
     return new_version
 
 
-def import_source_rpm(version):
-    srpms_dir = rpmbuild.get_srpms_path()
-    for srpm in list(srpms_dir.glob(f"discovery-cli-{version}-*.src.rpm")):
-        rhpkg.srpm_import(config.DISCOVERY_CLI_GIT_REPO_PATH, srpm)
-        # naively expect exactly one match
-        break
+def import_source_rpm(srpm_path):
+    rhpkg.srpm_import(config.DISCOVERY_CLI_GIT_REPO_PATH, srpm_path)
 
 
 def set_up_cli_repo():
+    prefetched = prefetch.wait(config.DISCOVERY_CLI_GIT_REPO_PATH)
     if not clone_repo(
         config.DISCOVERY_CLI_GIT_URL.format(username=config.KERBEROS_USERNAME),
         config.DISCOVERY_CLI_GIT_REPO_PATH,
     ):
         try:
-            checkout_ref(config.DISCOVERY_CLI_GIT_REPO_PATH, "master")
-            pull_repo(config.DISCOVERY_CLI_GIT_REPO_PATH)
+            checkout_ref(
+                config.DISCOVERY_CLI_GIT_REPO_PATH, "master", fetch=not prefetched
+            )
+            pull_repo(config.DISCOVERY_CLI_GIT_REPO_PATH, fetch=not prefetched)
         except GitPullFailure as e:
             warning(f"{e}")
 
 
 def build_cli():
-    rpmbuild.purge_rpmbuild_tree()
-    set_up_cli_repo()
+    checkpoint = Checkpoint("cli")
+    repo_path = config.DISCOVERY_CLI_GIT_REPO_PATH
 
-    if not Confirm.ask("Want to [b]automate[/b] version updates?", default=True):
-        show_next_steps_summary(with_scratch=True)
-        return
+    # hold the repo until the result is pushed, but not through the brew build
+    with repo_lock(repo_path):
+        checkpoint.run("purge", rpmbuild.purge_rpmbuild_tree)
+        checkpoint.run(
+            "set_up_repo",
+            set_up_cli_repo,
+            validate=lambda _: path.isdir(repo_path) and is_git_repo(repo_path),
+        )
 
-    base_branch = get_existing_release_branch(
-        config.DISCOVERY_CLI_GIT_REPO_PATH,
-        config.DISCOVERY_CLI_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
-        config.DISCOVERY_CLI_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
-    )
-    new_private_branch(base_branch, config.DISCOVERY_CLI_GIT_REPO_PATH)
-    target_name = base_branch.split("/")[-1]  # maybe not strictly true but good enough
-
-    specfile_path = Path(f"{config.DISCOVERY_CLI_GIT_REPO_PATH}/discovery-cli.spec")
-    if new_version := update_specfile_version(specfile_path):
-        commit(
-            config.DISCOVERY_CLI_GIT_REPO_PATH,
-            default_commit_message=f"build: update version to {new_version}",
-            and_push=False,
+        automate = checkpoint.run(
+            "automate",
+            lambda: {
+                "automate": confirm(
+                    "automate", "Want to [b]automate[/b] version updates?", default=True
+                )
+            },
+        )
+        if not automate["automate"]:
+            checkpoint.finish()
+            show_next_steps_summary(with_scratch=True)
+            return
+
+        def choose_branch():
+            base_branch = get_existing_release_branch(
+                repo_path,
+                config.DISCOVERY_CLI_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
+                config.DISCOVERY_CLI_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
+            )
+            new_private_branch(base_branch, repo_path)
+            return {
+                "base_branch": base_branch,
+                "private_branch": config.PRIVATE_BRANCH_NAME,
+            }
+
+        branch = checkpoint.run(
+            "branch",
+            choose_branch,
+            validate=lambda saved: current_branch(repo_path) == saved["private_branch"],
+        )
+        base_branch = branch["base_branch"]
+        # maybe not strictly true but good enough
+        target_name = base_branch.split("/")[-1]
+
+        specfile_path = Path(f"{repo_path}/discovery-cli.spec")
+        spec = checkpoint.run(
+            "spec",
+            lambda: {
+                "new_version": update_specfile_version(specfile_path),
+                "spec_sha256": file_sha256(specfile_path),
+            },
+            validate=lambda saved: file_sha256(specfile_path) == saved["spec_sha256"],
         )
-        rpmbuild.build_source_rpm(specfile_path)
-        import_source_rpm(new_version)
-        commit(
-            config.DISCOVERY_CLI_GIT_REPO_PATH,
-            default_commit_message="build: update sources",
-            and_push=False,
+
+        if new_version := spec["new_version"]:
+
+            def build_srpm():
+                rpmbuild.build_source_rpm(specfile_path)
+                srpm = rpmbuild.require_source_rpm("discovery-cli", new_version)
+                return {"srpm": str(srpm), "srpm_sha256": file_sha256(srpm)}
+
+            srpm = checkpoint.run(
+                "srpm",
+                build_srpm,
+                validate=lambda saved: (
+                    file_sha256(saved["srpm"]) == saved["srpm_sha256"]
+                ),
+            )
+
+            def validate_package():
+                return start_validation(specfile_path, srpm["srpm"], repo_path)
+
+            # check the spec and SRPM locally while the operator writes the commit
+            # message, unless resuming skips past the validation anyway
+            validation = validate_package() if checkpoint.pending("validate") else None
+
+            def commit_spec():
+                if not commit(
+                    repo_path,
+                    default_commit_message=f"build: update version to {new_version}",
+                    and_push=False,
+                ):
+                    raise GitCommitFailure(f"Failed to commit the spec in {repo_path}")
+                return {"commit": head_commit(repo_path)}
+
+            checkpoint.run(
+                "commit_spec",
+                commit_spec,
+                validate=lambda saved: has_commit(repo_path, saved["commit"]),
+            )
+
+            checkpoint.run(
+                "validate",
+                lambda: finish_validation(validation or validate_package()),
+            )
+
+            def import_sources():
+                import_source_rpm(srpm["srpm"])
+                commit(
+                    repo_path,
+                    default_commit_message="build: update sources",
+                    and_push=False,
+                )
+                return {"commit": head_commit(repo_path)}
+
+            checkpoint.run(
+                "import",
+                import_sources,
+                validate=lambda saved: has_commit(repo_path, saved["commit"]),
+            )
+
+        def push_branch():
+            push(repo_path)
+            return {"commit": head_commit(repo_path)}
+
+        checkpoint.run(
+            "push",
+            push_branch,
+            validate=lambda saved: head_commit(repo_path) == saved["commit"],
+        )
+
+    def scratch_build():
+        if not confirm(
+            "scratch", "Want to create a [b]scratch[/b] build?", default=True
+        ):
+            return {"scratch": False}
+        release = ask("release", "What rhpkg '--release' value?", default="rhel-9")
+        target = answer("target", f"{target_name}-candidate")
+        task_id = rhpkg.build(
+            scratch=True,
+            release=release,
+            target=target,
+            repo_path=repo_path,
         )
-    push(config.DISCOVERY_CLI_GIT_REPO_PATH)
+        return {
+            "scratch": True,
+            "release": release,
+            "target": target,
+            "task_id": task_id,
+        }
+
+    scratch = checkpoint.run("scratch_build", scratch_build)
+    checkpoint.finish()
 
-    if not Confirm.ask("Want to create a [b]scratch[/b] build?", default=True):
+    if not scratch["scratch"]:
         show_next_steps_summary(with_scratch=True)
         return
-
-    release = Prompt.ask("What rhpkg '--release' value?", default="rhel-9")
-    target = f"{target_name}-candidate"
-    rhpkg.build(
-        scratch=True,
-        release=release,
-        target=target,
-        repo_path=config.DISCOVERY_CLI_GIT_REPO_PATH,
+    show_next_steps_summary(
+        with_scratch=False, release=scratch["release"], target=scratch["target"]
     )
 
-    show_next_steps_summary(with_scratch=False, release=release, target=target)
-
 
 def show_next_steps_summary(with_scratch=True, release="rhel-9", target=None):
     if not target:
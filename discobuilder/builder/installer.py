@@ -1,20 +1,31 @@
 # TODO: Refactor/deduplicate a lot of similar code between this and ./cli.py.
-from textwrap import dedent
-
 import re
+from os import path
 from pathlib import Path
+from textwrap import dedent
 
-import requests
-from rich.prompt import Confirm, Prompt
+from discobuilder import answer, ask, config, confirm, console, prefetch, warning
+from discobuilder.adapter import git, rhpkg, rpmbuild
+from discobuilder.checkpoint import Checkpoint, file_sha256
+from discobuilder.lock import repo_lock
+from discobuilder.validation import finish_validation, start_validation
 
-from discobuilder import config, console, warning
-from discobuilder.adapter import git
-from discobuilder.adapter import rhpkg, rpmbuild
+SPEC_GLOBALS = [
+    "product_name_lower",
+    "product_name_title",
+    "version_installer",
+    "server_image",
+    "ui_image",
+]
 
 
 def update_specfile_from_upstream(specfile_path: Path):
-    quipucords_committish = Prompt.ask(
-        "Pull from what quipucords-installer committish?", default="main"
+    import requests
+
+    quipucords_committish = ask(
+        "upstream_committish",
+        "Pull from what quipucords-installer committish?",
+        default="main",
     )
     url = config.QUIPUCORDS_INSTALLER_SPEC_URL.format(quipucords_committish)
     response = requests.get(url)
@@ -22,6 +33,7 @@ def update_specfile_from_upstream(specfile_path: Path):
         raise Exception(f"Unexpected status {response.status_code} downloading {url}")
     with specfile_path.open("w") as f:
         f.writelines(response.text)
+    return quipucords_committish
 
 
 def update_specfile_globals(spec_globals: list[str], specfile_path: Path):
@@ -46,7 +58,9 @@ def update_specfile_globals(spec_globals: list[str], specfile_path: Path):
         for spec_global in spec_globals:
             if line_match := re.match(patterns[spec_global], line):
                 old_value = line_match.group(2)
-                new_value = Prompt.ask(prompts[spec_global], default=old_value)
+                new_value = ask(
+                    f"version.{spec_global}", prompts[spec_global], default=old_value
+                )
                 specfile_lines[line_number] = f"{line_match.group(1)}{new_value}\n"
                 new_values[spec_global] = new_value
                 dirty = True
@@ -59,97 +73,206 @@ def update_specfile_globals(spec_globals: list[str], specfile_path: Path):
     return new_values, dirty
 
 
-def import_source_rpm(version):
-    srpms_dir = rpmbuild.get_srpms_path()
-    for srpm in list(srpms_dir.glob(f"discovery-installer-{version}-*.src.rpm")):
-        rhpkg.srpm_import(config.DISCOVERY_INSTALLER_GIT_REPO_PATH, srpm)
-        # naively expect exactly one match
-        return
-    raise Exception(
-        f"No SRPMs found? ({srpms_dir}/discovery-installer-{version}-*.src.rpm)"
-    )
+def import_source_rpm(srpm_path):
+    rhpkg.srpm_import(config.DISCOVERY_INSTALLER_GIT_REPO_PATH, srpm_path)
 
 
 def set_up_repo():
+    prefetched = prefetch.wait(config.DISCOVERY_INSTALLER_GIT_REPO_PATH)
     if not git.clone_repo(
         config.DISCOVERY_INSTALLER_GIT_URL.format(username=config.KERBEROS_USERNAME),
         config.DISCOVERY_INSTALLER_GIT_REPO_PATH,
     ):
         try:
-            git.checkout_ref(config.DISCOVERY_INSTALLER_GIT_REPO_PATH, "master")
-            git.pull_repo(config.DISCOVERY_INSTALLER_GIT_REPO_PATH)
+            git.checkout_ref(
+                config.DISCOVERY_INSTALLER_GIT_REPO_PATH, "master", fetch=not prefetched
+            )
+            git.pull_repo(
+                config.DISCOVERY_INSTALLER_GIT_REPO_PATH, fetch=not prefetched
+            )
         except git.GitPullFailure as e:
             warning(f"{e}")
 
 
 def build_installer():
-    rpmbuild.purge_rpmbuild_tree()
-    set_up_repo()
-
-    if not Confirm.ask("Want to [b]automate[/b] version updates?", default=True):
-        show_next_steps_summary(with_scratch=True)
-        return
-
-    base_branch = git.get_existing_release_branch(
-        config.DISCOVERY_INSTALLER_GIT_REPO_PATH,
-        config.DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
-        config.DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
-    )
-    git.new_private_branch(base_branch, config.DISCOVERY_INSTALLER_GIT_REPO_PATH)
-    target_name = base_branch.split("/")[-1]  # maybe not strictly true but good enough
-
-    specfile_path = Path(
-        f"{config.DISCOVERY_INSTALLER_GIT_REPO_PATH}/discovery-installer.spec"
-    )
+    checkpoint = Checkpoint("installer")
+    repo_path = config.DISCOVERY_INSTALLER_GIT_REPO_PATH
+    specfile_path = Path(f"{repo_path}/discovery-installer.spec")
+
+    # hold the repo until the result is pushed, but not through the brew build
+    with repo_lock(repo_path):
+        checkpoint.run("purge", rpmbuild.purge_rpmbuild_tree)
+        checkpoint.run(
+            "set_up_repo",
+            set_up_repo,
+            validate=lambda _: path.isdir(repo_path) and git.is_git_repo(repo_path),
+        )
 
-    if refreshed := Confirm.ask(
-        "Refresh the spec file from [b]upstream[/b]?", default=True
-    ):
-        update_specfile_from_upstream(specfile_path)
-
-    spec_globals = [
-        "product_name_lower",
-        "product_name_title",
-        "version_installer",
-        "server_image",
-        "ui_image",
-    ]
-    new_spec_globals, updated = update_specfile_globals(spec_globals, specfile_path)
-
-    if refreshed or updated:
-        new_version = new_spec_globals["version_installer"]
-        git.add(config.DISCOVERY_INSTALLER_GIT_REPO_PATH, specfile_path)
-        git.commit(
-            config.DISCOVERY_INSTALLER_GIT_REPO_PATH,
-            default_commit_message=(
-                f"build: update discovery-installer to {new_version}"
+        automate = checkpoint.run(
+            "automate",
+            lambda: {
+                "automate": confirm(
+                    "automate", "Want to [b]automate[/b] version updates?", default=True
+                )
+            },
+        )
+        if not automate["automate"]:
+            checkpoint.finish()
+            show_next_steps_summary(with_scratch=True)
+            return
+
+        def choose_branch():
+            base_branch = git.get_existing_release_branch(
+                repo_path,
+                config.DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
+                config.DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
+            )
+            git.new_private_branch(base_branch, repo_path)
+            return {
+                "base_branch": base_branch,
+                "private_branch": config.PRIVATE_BRANCH_NAME,
+            }
+
+        branch = checkpoint.run(
+            "branch",
+            choose_branch,
+            validate=lambda saved: (
+                git.current_branch(repo_path) == saved["private_branch"]
             ),
-            and_push=False,
         )
-        rpmbuild.build_source_rpm(specfile_path)
-        import_source_rpm(new_version)
-        git.commit(
-            config.DISCOVERY_INSTALLER_GIT_REPO_PATH,
-            default_commit_message="build: update sources",
-            and_push=False,
+        base_branch = branch["base_branch"]
+        # maybe not strictly true but good enough
+        target_name = base_branch.split("/")[-1]
+
+        def update_spec():
+            committish = None
+            if refreshed := confirm(
+                "refresh_spec",
+                "Refresh the spec file from [b]upstream[/b]?",
+                default=True,
+            ):
+                committish = update_specfile_from_upstream(specfile_path)
+
+            new_spec_globals, updated = update_specfile_globals(
+                SPEC_GLOBALS, specfile_path
+            )
+            return {
+                "refreshed": refreshed,
+                "committish": committish,
+                "updated": updated,
+                "spec_globals": new_spec_globals,
+                "spec_sha256": file_sha256(specfile_path),
+            }
+
+        spec = checkpoint.run(
+            "spec",
+            update_spec,
+            validate=lambda saved: file_sha256(specfile_path) == saved["spec_sha256"],
+        )
+
+        if spec["refreshed"] or spec["updated"]:
+            new_version = spec["spec_globals"]["version_installer"]
+
+            def build_srpm():
+                rpmbuild.build_source_rpm(specfile_path)
+                srpm = rpmbuild.require_source_rpm("discovery-installer", new_version)
+                return {"srpm": str(srpm), "srpm_sha256": file_sha256(srpm)}
+
+            srpm = checkpoint.run(
+                "srpm",
+                build_srpm,
+                validate=lambda saved: (
+                    file_sha256(saved["srpm"]) == saved["srpm_sha256"]
+                ),
+            )
+
+            def validate_package():
+                return start_validation(specfile_path, srpm["srpm"], repo_path)
+
+            # check the spec and SRPM locally while the operator writes the commit
+            # message, unless resuming skips past the validation anyway
+            validation = validate_package() if checkpoint.pending("validate") else None
+
+            def commit_spec():
+                git.add(repo_path, specfile_path)
+                if not git.commit(
+                    repo_path,
+                    default_commit_message=(
+                        f"build: update discovery-installer to {new_version}"
+                    ),
+                    and_push=False,
+                ):
+                    raise git.GitCommitFailure(
+                        f"Failed to commit the spec in {repo_path}"
+                    )
+                return {"commit": git.head_commit(repo_path)}
+
+            checkpoint.run(
+                "commit_spec",
+                commit_spec,
+                validate=lambda saved: git.has_commit(repo_path, saved["commit"]),
+            )
+
+            checkpoint.run(
+                "validate",
+                lambda: finish_validation(validation or validate_package()),
+            )
+
+            def import_sources():
+                import_source_rpm(srpm["srpm"])
+                git.commit(
+                    repo_path,
+                    default_commit_message="build: update sources",
+                    and_push=False,
+                )
+                return {"commit": git.head_commit(repo_path)}
+
+            checkpoint.run(
+                "import",
+                import_sources,
+                validate=lambda saved: git.has_commit(repo_path, saved["commit"]),
+            )
+
+        def push():
+            git.push(repo_path)
+            return {"commit": git.head_commit(repo_path)}
+
+        checkpoint.run(
+            "push",
+            push,
+            validate=lambda saved: git.head_commit(repo_path) == saved["commit"],
+        )
+
+    def scratch_build():
+        if not confirm(
+            "scratch", "Want to create a [b]scratch[/b] build?", default=True
+        ):
+            return {"scratch": False}
+        release = ask("release", "What rhpkg '--release' value?", default="rhel-9")
+        target = answer("target", f"{target_name}-candidate")
+        task_id = rhpkg.build(
+            scratch=True,
+            release=release,
+            target=target,
+            repo_path=repo_path,
         )
-    git.push(config.DISCOVERY_INSTALLER_GIT_REPO_PATH)
+        return {
+            "scratch": True,
+            "release": release,
+            "target": target,
+            "task_id": task_id,
+        }
 
-    if not Confirm.ask("Want to create a [b]scratch[/b] build?", default=True):
+    scratch = checkpoint.run("scratch_build", scratch_build)
+    checkpoint.finish()
+
+    if not scratch["scratch"]:
         show_next_steps_summary(with_scratch=True)
         return
-
-    release = Prompt.ask("What rhpkg '--release' value?", default="rhel-9")
-    target = f"{target_name}-candidate"
-    rhpkg.build(
-        scratch=True,
-        release=release,
-        target=target,
-        repo_path=config.DISCOVERY_INSTALLER_GIT_REPO_PATH,
+    show_next_steps_summary(
+        with_scratch=False, release=scratch["release"], target=scratch["target"]
     )
 
-    show_next_steps_summary(with_scratch=False, release=release, target=target)
-
 
 def show_next_steps_summary(with_scratch=True, release="rhel-9", target=None):
     if not target:
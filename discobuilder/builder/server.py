@@ -1,30 +1,47 @@
+from os import path
 from textwrap import dedent
 
-import yaml
-from rich.prompt import Confirm, Prompt
-
-from discobuilder import config, console, warning
+from discobuilder import (
+    answer,
+    ask,
+    config,
+    confirm,
+    console,
+    prefetch,
+    upstream,
+    warning,
+)
+from discobuilder.adapter import rhpkg
 from discobuilder.adapter.chaski import run_chaski, set_up_chaski
 from discobuilder.adapter.git import (
     GitPullFailure,
     checkout_ref,
     clone_repo,
     commit,
+    current_branch,
     get_existing_release_branch,
+    head_commit,
+    is_git_repo,
     new_private_branch,
     pull_repo,
+    push,
 )
-from discobuilder.adapter import rhpkg
+from discobuilder.checkpoint import Checkpoint, file_sha256
+from discobuilder.dashboard import dashboard
+from discobuilder.lock import repo_lock
 
 
 def set_up_server_repo():
+    prefetched = prefetch.wait(config.DISCOVERY_SERVER_GIT_REPO_PATH)
     if not clone_repo(
         config.DISCOVERY_SERVER_GIT_URL.format(username=config.KERBEROS_USERNAME),
         config.DISCOVERY_SERVER_GIT_REPO_PATH,
     ):
         try:
-            checkout_ref(config.DISCOVERY_SERVER_GIT_REPO_PATH, "master")
-            pull_repo(config.DISCOVERY_SERVER_GIT_REPO_PATH)
+            checkout_ref(
+                config.DISCOVERY_SERVER_GIT_REPO_PATH, "master", fetch=not prefetched
+            )
+            pull_repo(config.DISCOVERY_SERVER_GIT_REPO_PATH, fetch=not prefetched)
         except GitPullFailure as e:
             warning(f"{e}")
 
@@ -97,45 +114,150 @@ def show_next_steps_summary(
 
 
 def update_sources_yaml():
-    with open(
-        f"{config.DISCOVERY_SERVER_GIT_REPO_PATH}/sources-version.yaml", "r"
-    ) as versions_file:
-        sources_versions = yaml.safe_load(versions_file)
+    import yaml
+
+    sources_yaml_path = f"{config.DISCOVERY_SERVER_GIT_REPO_PATH}/sources-version.yaml"
+    with open(sources_yaml_path, "r") as versions_file:
+        text = versions_file.read()
+    sources_versions = yaml.safe_load(text)
+
+    with dashboard.status("Looking up the latest upstream releases..."):
+        resolved = upstream.resolve_versions(sources_versions)
+    upstream.show_proposals(sources_versions, resolved)
+    proposals = {
+        key: proposed for key, (_, proposed, _) in resolved.items() if proposed
+    }
+    accepted = confirm(
+        "accept_versions", "Use the [b]proposed[/b] versions?", default=True
+    )
+
+    new_versions = {}
     for key, value in sources_versions.items():
-        new_value = Prompt.ask(f"New value for '{key}'", default=value)
-        sources_versions[key] = new_value
-    with open(
-        f"{config.DISCOVERY_SERVER_GIT_REPO_PATH}/sources-version.yaml", "w"
-    ) as versions_file:
-        versions_file.write(yaml.dump(sources_versions, Dumper=yaml.CDumper))
+        default = proposals.get(key, value)
+        if accepted:
+            new_versions[key] = answer(f"version.{key}", default)
+        else:
+            new_versions[key] = ask(
+                f"version.{key}", f"New value for '{key}'", default=default
+            )
+    changes = {
+        key: str(new_versions[key])
+        for key, value in sources_versions.items()
+        if str(new_versions[key]) != str(value)
+    }
+    if changes:
+        with open(sources_yaml_path, "w") as versions_file:
+            versions_file.write(upstream.replace_scalars(text, changes))
+    return new_versions
 
 
 def build_server():
-    set_up_chaski()
-    set_up_server_repo()
-    if not Confirm.ask("Want to [b]automate[/b] version updates?", default=True):
-        show_next_steps_summary()
-        return
+    checkpoint = Checkpoint("server")
+    repo_path = config.DISCOVERY_SERVER_GIT_REPO_PATH
+    sources_yaml_path = f"{repo_path}/sources-version.yaml"
 
-    base_branch = get_existing_release_branch(
-        config.DISCOVERY_SERVER_GIT_REPO_PATH,
-        config.DISCOVERY_SERVER_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
-        config.DISCOVERY_SERVER_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
-    )
-    new_private_branch(base_branch, config.DISCOVERY_SERVER_GIT_REPO_PATH)
-    target_name = base_branch.split("/")[-1]  # maybe not strictly true but good enough
-    update_sources_yaml()
-    run_chaski(config.DISCOVERY_SERVER_GIT_REPO_PATH)
-    commit(config.DISCOVERY_SERVER_GIT_REPO_PATH)
-    if not Confirm.ask("Want to create a [b]scratch[/b] build?", default=True):
+    # hold the repo until the result is pushed, but not through the brew build
+    with repo_lock(repo_path):
+        checkpoint.run(
+            "set_up_chaski",
+            set_up_chaski,
+            validate=lambda _: path.isdir(config.CHASKI_GIT_REPO_PATH),
+        )
+        checkpoint.run(
+            "set_up_repo",
+            set_up_server_repo,
+            validate=lambda _: path.isdir(repo_path) and is_git_repo(repo_path),
+        )
+        automate = checkpoint.run(
+            "automate",
+            lambda: {
+                "automate": confirm(
+                    "automate", "Want to [b]automate[/b] version updates?", default=True
+                )
+            },
+        )
+        if not automate["automate"]:
+            checkpoint.finish()
+            show_next_steps_summary()
+            return
+
+        def choose_branch():
+            base_branch = get_existing_release_branch(
+                repo_path,
+                config.DISCOVERY_SERVER_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
+                config.DISCOVERY_SERVER_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
+            )
+            new_private_branch(base_branch, repo_path)
+            return {
+                "base_branch": base_branch,
+                "private_branch": config.PRIVATE_BRANCH_NAME,
+            }
+
+        branch = checkpoint.run(
+            "branch",
+            choose_branch,
+            validate=lambda saved: current_branch(repo_path) == saved["private_branch"],
+        )
+        target_name = branch["base_branch"].split("/")[-1]  # maybe not strictly true
+
+        checkpoint.run(
+            "sources",
+            lambda: {
+                "sources_versions": update_sources_yaml(),
+                "sources_sha256": file_sha256(sources_yaml_path),
+            },
+            validate=lambda saved: (
+                file_sha256(sources_yaml_path) == saved["sources_sha256"]
+            ),
+        )
+        checkpoint.run("chaski", lambda: run_chaski(repo_path))
+
+        def commit_changes():
+            committed = commit(repo_path, and_push=False)
+            return {
+                "commit": head_commit(repo_path),
+                "push": committed
+                or confirm(
+                    "push_anyway", "Failed git commit. Push anyway?", default=True
+                ),
+            }
+
+        committed = checkpoint.run(
+            "commit",
+            commit_changes,
+            validate=lambda saved: head_commit(repo_path) == saved["commit"],
+        )
+
+        def push_branch():
+            push(repo_path)
+            return {"commit": head_commit(repo_path)}
+
+        if committed["push"]:
+            checkpoint.run(
+                "push",
+                push_branch,
+                validate=lambda saved: head_commit(repo_path) == saved["commit"],
+            )
+
+    def scratch_build():
+        if not confirm(
+            "scratch", "Want to create a [b]scratch[/b] build?", default=True
+        ):
+            return {"scratch": False}
+        target = answer("target", f"{target_name}-containers-candidate")
+        task_id = rhpkg.container_build(
+            repo_path=repo_path,
+            scratch=True,
+            target=target,
+        )
+        return {"scratch": True, "target": target, "task_id": task_id}
+
+    scratch = checkpoint.run("scratch_build", scratch_build)
+    checkpoint.finish()
+
+    if not scratch["scratch"]:
         show_next_steps_summary(with_chaski=False, server_target=target_name)
         return
-
-    rhpkg.container_build(
-        repo_path=config.DISCOVERY_SERVER_GIT_REPO_PATH,
-        scratch=True,
-        target=f"{target_name}-containers-candidate",
-    )
     show_next_steps_summary(
         with_chaski=False, with_scratch=False, server_target=target_name
     )
@@ -0,0 +1,303 @@
+"""
+Pack warm repos and caches into one archive, and restore them elsewhere.
+
+`cache export` writes a gzipped tar holding a git bundle of each repo, the
+chaski virtualenv (fingerprinted by the sha256 of chaski's poetry.lock), and
+the shared rpmbuild SOURCES downloads, with a manifest of their checksums.
+SRPMs are not archived, since each run builds its own.
+`cache import` verifies and restores only what is missing or different
+locally, so a new container can start warm from local disk with no network.
+"""
+
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+
+from discobuilder import config, console, warning
+from discobuilder.adapter.rpmbuild import get_sources_path
+from discobuilder.adapter.subprocess import subprocess_run
+from discobuilder.checkpoint import file_sha256
+from discobuilder.lock import repo_lock, rpmbuild_lock
+from discobuilder.preflight import repo_paths
+
+MANIFEST_NAME = "manifest.json"
+VENV_MARKER = ".discobuilder-poetry-lock-sha256"
+
+
+class CacheArchiveFailure(Exception):
+    pass
+
+
+def git(args, cwd=None):
+    git_run = subprocess_run(["git", *args], cwd=cwd, capture_output=True)
+    if git_run.returncode != 0:
+        raise CacheArchiveFailure(
+            f"`git {' '.join(map(str, args))}` failed: {git_run.stderr.decode().strip()}"
+        )
+    return git_run.stdout.decode()
+
+
+def chaski_venv_path():
+    env_info = subprocess_run(
+        [
+            "python3",
+            "-m",
+            "poetry",
+            "env",
+            "info",
+            "--path",
+            "-C",
+            config.CHASKI_GIT_REPO_PATH,
+        ],
+        capture_output=True,
+    )
+    if env_info.returncode != 0 or not (venv_path := env_info.stdout.decode().strip()):
+        return None
+    return Path(venv_path)
+
+
+def chaski_lock_sha256():
+    lock_path = Path(config.CHASKI_GIT_REPO_PATH) / "poetry.lock"
+    return file_sha256(lock_path)
+
+
+def export_repo(repo_path, work_dir):
+    name = Path(repo_path).name
+    bundle_path = Path(work_dir) / f"{name}.bundle"
+    with repo_lock(repo_path, exclusive=False):
+        git(["bundle", "create", bundle_path, "--all"], cwd=repo_path)
+        origin = git(["remote", "get-url", "origin"], cwd=repo_path).strip()
+    heads = [
+        line.split()[0]
+        for line in git(["bundle", "list-heads", bundle_path]).splitlines()
+    ]
+    return bundle_path, {
+        "kind": "repo",
+        "name": f"repos/{name}.bundle",
+        "path": str(repo_path),
+        "origin": origin,
+        "heads": sorted(set(heads)),
+    }
+
+
+def export_venv(work_dir):
+    if not (venv_path := chaski_venv_path()) or not venv_path.is_dir():
+        return None
+    venv_tar_path = Path(work_dir) / "chaski-venv.tar"
+    with tarfile.open(venv_tar_path, "w") as venv_tar:
+        venv_tar.add(venv_path, arcname=".")
+    return venv_tar_path, {
+        "kind": "venv",
+        "name": "venv/chaski.tar",
+        "path": str(venv_path),
+        "lock_sha256": chaski_lock_sha256(),
+    }
+
+
+def export_files(directory, prefix):
+    for file_path in sorted(Path(directory).glob("*")):
+        if file_path.is_file():
+            yield (
+                file_path,
+                {
+                    "kind": "file",
+                    "name": f"{prefix}/{file_path.name}",
+                    "path": str(file_path),
+                },
+            )
+
+
+def export_cache(archive_path):
+    archive_path = Path(archive_path)
+    members = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for repo_path in repo_paths():
+            if not (Path(repo_path) / ".git").is_dir():
+                continue
+            try:
+                members.append(export_repo(repo_path, work_dir))
+            except CacheArchiveFailure as e:
+                warning(f"Skipping {repo_path}: {e}")
+        if venv := export_venv(work_dir):
+            members.append(venv)
+
+        with rpmbuild_lock(exclusive=False):
+            members += export_files(get_sources_path(), "rpmbuild/SOURCES")
+            for member_path, entry in members:
+                entry["sha256"] = file_sha256(member_path)
+                entry["size"] = os.path.getsize(member_path)
+
+            manifest = {
+                "created": time.time(),
+                "entries": [entry for _, entry in members],
+            }
+            manifest_path = Path(work_dir) / MANIFEST_NAME
+            manifest_path.write_text(json.dumps(manifest, indent=2))
+
+            archive_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = archive_path.with_name(f"{archive_path.name}.tmp")
+            with tarfile.open(temp_path, "w:gz", compresslevel=6) as archive:
+                archive.add(manifest_path, arcname=MANIFEST_NAME)
+                for member_path, entry in members:
+                    archive.add(member_path, arcname=entry["name"])
+            os.replace(temp_path, archive_path)
+
+    show_summary(
+        f"Exported to {archive_path}",
+        [(entry["name"], "exported", entry["size"]) for _, entry in members],
+    )
+
+
+def local_path_for(entry):
+    """Where to restore an entry, following this container's configuration."""
+    name = Path(entry["name"])
+    if entry["kind"] == "repo":
+        configured = {Path(repo_path).name: repo_path for repo_path in repo_paths()}
+        return Path(configured.get(name.stem, entry["path"]))
+    if entry["kind"] == "file":
+        return get_sources_path() / name.name
+    return Path(entry["path"])
+
+
+def is_current(entry):
+    """Return True if an archived entry is already present locally."""
+    local_path = local_path_for(entry)
+    if entry["kind"] == "file":
+        return local_path.is_file() and file_sha256(local_path) == entry["sha256"]
+    if entry["kind"] == "repo":
+        if not (local_path / ".git").is_dir():
+            return False
+        return all(
+            subprocess_run(
+                ["git", "cat-file", "-e", f"{head}^{{commit}}"],
+                cwd=local_path,
+                capture_output=True,
+            ).returncode
+            == 0
+            for head in entry["heads"]
+        )
+    if entry["kind"] == "venv":
+        marker_path = local_path / VENV_MARKER
+        return marker_path.is_file() and marker_path.read_text() == entry["lock_sha256"]
+    return False
+
+
+def extract_verified(archive, entry, work_dir):
+    """Extract one member to a temporary file and check its sha256."""
+    extracted_path = Path(work_dir) / Path(entry["name"]).name
+    source = archive.extractfile(entry["name"])
+    if source is None:
+        raise CacheArchiveFailure(f"{entry['name']} is missing from the archive")
+    with source, extracted_path.open("wb") as extracted_file:
+        shutil.copyfileobj(source, extracted_file, 1024 * 1024)
+    if file_sha256(extracted_path) != entry["sha256"]:
+        raise CacheArchiveFailure(f"Checksum mismatch for {entry['name']}")
+    return extracted_path
+
+
+def import_repo(entry, bundle_path):
+    repo_path = local_path_for(entry)
+    with repo_lock(repo_path):
+        if not (repo_path / ".git").is_dir():
+            repo_path.parent.mkdir(parents=True, exist_ok=True)
+            git(["clone", "--quiet", bundle_path, repo_path])
+            git(["remote", "set-url", "origin", entry["origin"]], cwd=repo_path)
+            # restore remote-tracking refs as they were, not as the bundle's
+            # branches; a fresh clone has nothing of its own to overwrite
+            refspecs = [
+                "+refs/remotes/origin/*:refs/remotes/origin/*",
+                "+refs/tags/*:refs/tags/*",
+            ]
+            action = "cloned"
+        else:
+            # never move refs the repo already has, which may be newer
+            local_refs = set(
+                git(["for-each-ref", "--format=%(refname)"], cwd=repo_path).split()
+            )
+            refspecs = [
+                f"{ref}:{ref}"
+                for ref in bundle_refs(bundle_path)
+                if ref.startswith(("refs/remotes/origin/", "refs/tags/"))
+                and ref not in local_refs
+            ]
+            action = f"fetched {len(refspecs)} missing refs"
+        if refspecs:
+            git(["fetch", "--quiet", bundle_path, *refspecs], cwd=repo_path)
+    return action
+
+
+def bundle_refs(bundle_path):
+    return {
+        line.split()[1]
+        for line in git(["bundle", "list-heads", bundle_path]).splitlines()
+        if len(line.split()) == 2
+    }
+
+
+def import_venv(entry, venv_tar_path):
+    venv_path = local_path_for(entry)
+    if entry["lock_sha256"] != chaski_lock_sha256():
+        return "skipped (chaski's poetry.lock differs)"
+    if venv_path.exists():
+        shutil.rmtree(venv_path)
+    venv_path.mkdir(parents=True)
+    with tarfile.open(venv_tar_path, "r") as venv_tar:
+        venv_tar.extractall(venv_path, filter="tar")
+    (venv_path / VENV_MARKER).write_text(entry["lock_sha256"])
+    return "restored"
+
+
+def import_file(entry, extracted_path):
+    local_path = local_path_for(entry)
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    with rpmbuild_lock():
+        shutil.move(extracted_path, local_path)
+    return "restored"
+
+
+def import_cache(archive_path):
+    with tarfile.open(archive_path, "r:gz") as archive:
+        manifest_file = archive.extractfile(MANIFEST_NAME)
+        if manifest_file is None:
+            raise CacheArchiveFailure(f"{archive_path} has no {MANIFEST_NAME}")
+        manifest = json.load(manifest_file)
+
+        # repos first, so the venv can be checked against chaski's poetry.lock
+        order = {"repo": 0, "venv": 1, "file": 2}
+        entries = sorted(manifest["entries"], key=lambda entry: order[entry["kind"]])
+        results = []
+        with tempfile.TemporaryDirectory() as work_dir:
+            for entry in entries:
+                if entry["kind"] == "file" and not entry["name"].startswith(
+                    "rpmbuild/SOURCES/"
+                ):
+                    # e.g. SRPMs from older archives; each run builds its own
+                    results.append((entry["name"], "skipped", 0))
+                    continue
+                if is_current(entry):
+                    results.append((entry["name"], "up to date", 0))
+                    continue
+                extracted_path = extract_verified(archive, entry, work_dir)
+                if entry["kind"] == "repo":
+                    action = import_repo(entry, extracted_path)
+                elif entry["kind"] == "venv":
+                    action = import_venv(entry, extracted_path)
+                else:
+                    action = import_file(entry, extracted_path)
+                extracted_path.unlink(missing_ok=True)
+                results.append((entry["name"], action, entry["size"]))
+
+    show_summary(f"Imported from {archive_path}", results)
+
+
+def show_summary(title, results):
+    from rich.table import Table
+
+    table = Table("entry", "action", "size", title=title)
+    for name, action, size in results:
+        table.add_row(name, action, f"{size / 1024**2:.1f} MiB" if size else "")
+    console.print(table)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+from discobuilder import config, console, metrics, warning
+from discobuilder.dashboard import dashboard
+
+
+class Checkpoint:
+    """
+    Record the outputs of each completed pipeline stage for a product.
+
+    Stages run in a fixed order. When resuming, a saved stage is skipped only if
+    its validator still accepts the saved outputs, and every stage after the
+    first incomplete or invalid one runs again from scratch.
+    """
+
+    def __init__(self, product):
+        self.product = product
+        self.path = Path(config.CHECKPOINT_DIR) / f"{product}.json"
+        self.stages = {}
+        self.resuming = False
+        self.started = time.monotonic()
+        if config.RESUME:
+            self.load()
+        metrics.context.set({"product": product, "run": uuid.uuid4().hex[:12]})
+        self.update_metrics_context()
+
+    def update_metrics_context(self):
+        if base_branch := self.stages.get("branch", {}).get("base_branch"):
+            branch = base_branch.split("/")[-1]
+            metrics.context.set({**metrics.context.get({}), "branch": branch})
+
+    def load(self):
+        try:
+            with self.path.open("r") as checkpoint_file:
+                saved = json.load(checkpoint_file)
+        except FileNotFoundError:
+            warning(f"No checkpoint found for {self.product}; starting over.")
+            return
+        except json.JSONDecodeError:
+            warning(f"Ignoring unreadable checkpoint at {self.path}.")
+            return
+        if saved.get("finished"):
+            warning(f"Last {self.product} build finished; starting over.")
+            return
+        self.stages = saved.get("stages", {})
+        self.resuming = bool(self.stages)
+        if private_branch_name := saved.get("private_branch_name"):
+            config.PRIVATE_BRANCH_NAME = private_branch_name
+
+    def save(self, finished=False):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with temp_path.open("w") as checkpoint_file:
+            json.dump(
+                {
+                    "product": self.product,
+                    "private_branch_name": config.PRIVATE_BRANCH_NAME,
+                    "stages": self.stages,
+                    "finished": finished,
+                },
+                checkpoint_file,
+                indent=2,
+            )
+        os.replace(temp_path, self.path)
+
+    def finish(self):
+        """Keep the final outputs for reference but never resume from them."""
+        self.save(finished=True)
+        self.record_run("succeeded")
+
+    def record_run(self, outcome, stage=None):
+        metrics.record(
+            "run_seconds",
+            time.monotonic() - self.started,
+            outcome=outcome,
+            stage=stage,
+        )
+        metrics.write_textfile()
+
+    def completed(self, name, validate=None):
+        """Return saved outputs for a stage if it may be skipped, else None."""
+        if not self.resuming or name not in self.stages:
+            self.resuming = False
+            return None
+        outputs = self.stages[name]
+        if validate and not validate(outputs):
+            warning(f"Saved outputs for stage '{name}' are stale; rerunning it.")
+            self.resuming = False
+            return None
+        return outputs
+
+    def pending(self, name):
+        """Return True unless resuming would skip this saved stage."""
+        return not (self.resuming and name in self.stages)
+
+    def run(self, name, func, validate=None):
+        """
+        Run one stage and save its outputs, or skip it when resuming.
+
+        `func` returns a JSON-serializable dict of the stage outputs (or None).
+        `validate` receives the saved outputs and returns True if they still hold.
+        """
+        if (outputs := self.completed(name, validate)) is not None:
+            console.print(f"Resuming past completed stage '{name}'.", style="green")
+            return outputs
+        self.discard_from(name)
+        label = " ".join(
+            str(part)
+            for part in (self.product, metrics.context.get({}).get("branch"), name)
+            if part
+        )
+        eta = metrics.estimate(
+            "stage_seconds", product=self.product, stage=name, outcome="succeeded"
+        )
+        try:
+            with (
+                dashboard.activity(label, eta),
+                metrics.timer("stage_seconds", stage=name),
+            ):
+                outputs = func() or {}
+        except BaseException:
+            self.record_run("failed", stage=name)
+            raise
+        self.stages[name] = outputs
+        self.save()
+        self.update_metrics_context()
+        return outputs
+
+    def discard_from(self, name):
+        """Forget a stage and every stage saved after it."""
+        names = list(self.stages)
+        if name in names:
+            for stale_name in names[names.index(name) :]:
+                del self.stages[stale_name]
+
+
+def file_sha256(file_path):
+    return file_digest(file_path, "sha256")
+
+
+def file_digest(file_path, algorithm):
+    """Hash a file in chunks, or return None if it does not exist."""
+    digest = hashlib.new(algorithm)
+    try:
+        with open(file_path, "rb") as checked_file:
+            while chunk := checked_file.read(1024 * 1024):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
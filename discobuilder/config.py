@@ -1,8 +1,8 @@
+import json
 import subprocess
 import time
 from os import environ
 
-
 # git user configs
 GIT_NAME = environ.get("GIT_NAME", None)
 GIT_EMAIL = environ.get("GIT_EMAIL", None)
@@ -10,6 +10,12 @@ GIT_SIGNING_KEY = environ.get("GIT_SIGNING_KEY", None)
 
 # who is pushing to dist-git
 KERBEROS_USERNAME = environ.get("KERBEROS_USERNAME", None)
+KLIST_COMMAND = environ.get("KLIST_COMMAND", "klist")
+KINIT_COMMAND = environ.get("KINIT_COMMAND", "kinit")
+KERBEROS_RENEW_BEFORE_SECONDS = int(
+    environ.get("KERBEROS_RENEW_BEFORE_SECONDS", "1800")
+)
+KERBEROS_POLL_SECONDS = int(environ.get("KERBEROS_POLL_SECONDS", "300"))
 PRIVATE_BRANCH_NAME = environ.get(
     "PRIVATE_BRANCH_NAME", f"private-{KERBEROS_USERNAME}-{time.time()}"
 )
@@ -72,8 +78,61 @@ DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_DEFAULT = environ.get(
 DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_PREFIX = environ.get(
     "DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_PREFIX", "remotes/origin/discovery-"
 )
+# where do the components in discovery-server's sources-version.yaml come from
+SOURCES_UPSTREAM_GIT_URLS = {
+    "quipucords-server": "https://github.com/quipucords/quipucords.git",
+    "quipucords-ui": "https://github.com/quipucords/quipucords-ui.git",
+    "qpc": "https://github.com/quipucords/qpc.git",
+    **json.loads(environ.get("SOURCES_UPSTREAM_GIT_URLS", "{}")),
+}
+SOURCES_UPSTREAM_GIT_URL_TEMPLATE = environ.get(
+    "SOURCES_UPSTREAM_GIT_URL_TEMPLATE", "https://github.com/quipucords/{key}.git"
+)
+# look for `<key>.git` repos in this local directory instead (e.g. for testing)
+SOURCES_UPSTREAM_MIRROR_DIR = environ.get("SOURCES_UPSTREAM_MIRROR_DIR", "")
+TAG_CACHE_PATH = environ.get("TAG_CACHE_PATH", "/repos/.cache/discobuilder-tags.json")
+TAG_CACHE_TTL_SECONDS = int(environ.get("TAG_CACHE_TTL_SECONDS", "900"))
+
+# where do concurrent discobuilder processes coordinate shared repos and caches
+LOCK_DIR = environ.get("LOCK_DIR", "/repos/.discobuilder/locks")
+
+# where do I remember progress for `--resume`
+CHECKPOINT_DIR = environ.get("CHECKPOINT_DIR", "/repos/.discobuilder/checkpoints")
+RESUME = environ.get("RESUME", "0") == "1"
+
+# should I clone and fetch every repo (and install chaski) in the background at launch
+PREFETCH = environ.get("PREFETCH", "1") == "1"
+
+# what should I check before starting
+PREFLIGHT = environ.get("PREFLIGHT", "1") == "1"
+PREFLIGHT_MIN_FREE_GB = float(environ.get("PREFLIGHT_MIN_FREE_GB", "2"))
+PREFLIGHT_MIN_TICKET_SECONDS = int(environ.get("PREFLIGHT_MIN_TICKET_SECONDS", "3600"))
+
+# where do `cache export` and `cache import` put and find warm repos and caches
+CACHE_ARCHIVE = environ.get("CACHE_ARCHIVE", "/cache/discobuilder-cache.tar.gz")
+
+# where do I keep build metrics, and where do I export them for Prometheus
+METRICS = environ.get("METRICS", "1") == "1"
+METRICS_PATH = environ.get("METRICS_PATH", "/repos/.discobuilder/metrics.jsonl")
+METRICS_TEXTFILE = environ.get(
+    "METRICS_TEXTFILE", "/repos/.discobuilder/discobuilder.prom"
+)
+
+# where and how do I run as a build service
+SERVICE_DIR = environ.get("SERVICE_DIR", "/repos/.discobuilder/service")
+SERVICE_HOST = environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(environ.get("SERVICE_PORT", "8642"))
+SERVICE_SOCKET = environ.get("SERVICE_SOCKET", "")
+SERVICE_WORKERS = int(environ.get("SERVICE_WORKERS", "2"))
+
+# where do I write `--profile` collapsed stacks, and how often do I sample
+PROFILE_DIR = environ.get("PROFILE_DIR", "/repos/.discobuilder/profiles")
+PROFILE_INTERVAL_MS = float(environ.get("PROFILE_INTERVAL_MS", "10"))
 
 # how noisy should I be
+DASHBOARD = environ.get("DASHBOARD", "1") == "1"
+DASHBOARD_REFRESH_PER_SECOND = float(environ.get("DASHBOARD_REFRESH_PER_SECOND", "4"))
+DASHBOARD_TAIL_LINES = int(environ.get("DASHBOARD_TAIL_LINES", "3"))
 SHOW_COMMANDS = environ.get("SHOW_COMMANDS", "0") == "1"
 VERBOSE_SUBPROCESSES = environ.get("VERBOSE_SUBPROCESSES", "0") == "1"
 STDOUT = subprocess.DEVNULL if not VERBOSE_SUBPROCESSES else subprocess.PIPE
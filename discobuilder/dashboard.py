@@ -0,0 +1,176 @@
+"""
+Show every running stage in a live dashboard instead of raw child output.
+
+Each pipeline stage and background job registers an activity with a label and
+an ETA estimated from past runs. While the dashboard runs, the subprocess
+adapter streams child output into the current thread's activity, where the
+last few lines are shown. Output that used to go straight to the terminal is
+printed above the dashboard in batches. The dashboard redraws at a fixed rate
+(DASHBOARD_REFRESH_PER_SECOND) no matter how much output arrives, and it
+pauses while prompting or running an interactive command.
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import count
+
+from discobuilder import config, console
+
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02}"
+
+
+class Activity:
+    def __init__(self, label, eta=None):
+        self.label = label
+        self.eta = eta
+        self.started = time.monotonic()
+        self.tail = deque(maxlen=config.DASHBOARD_TAIL_LINES)
+
+
+class Dashboard:
+    def __init__(self):
+        self.activities = {}
+        self.ids = count()
+        self.current = threading.local()
+        self.pending_lines = []
+        self.lock = threading.Lock()
+        self.live = None
+        self.pause_depth = 0
+        self.stopped = threading.Event()
+        self.refresher = None
+
+    @property
+    def active(self):
+        return self.refresher is not None
+
+    def new_live(self):
+        from rich.live import Live
+
+        live = Live(self, console=console, auto_refresh=False, transient=True)
+        live.start()
+        return live
+
+    def start(self):
+        if self.active or not config.DASHBOARD or not console.is_terminal:
+            return
+        self.live = self.new_live()
+        self.stopped.clear()
+        self.refresher = threading.Thread(
+            target=self.refresh_loop, name="dashboard", daemon=True
+        )
+        self.refresher.start()
+
+    def stop(self):
+        if not self.active:
+            return
+        self.stopped.set()
+        self.refresher.join()
+        self.refresher = None
+        self.refresh()
+        with self.lock:
+            if self.live:
+                self.live.stop()
+                self.live = None
+
+    def refresh_loop(self):
+        while not self.stopped.wait(1 / config.DASHBOARD_REFRESH_PER_SECOND):
+            self.refresh()
+
+    def refresh(self):
+        """Print output collected since the last refresh, then redraw once."""
+        with self.lock:
+            if not self.live:
+                return  # paused; keep collecting until it resumes
+            lines, self.pending_lines = self.pending_lines, []
+            if lines:
+                from rich.text import Text
+
+                self.live.console.print(Text("\n".join(lines)), highlight=False)
+            self.live.refresh()
+
+    @contextmanager
+    def paused(self):
+        """Hide the dashboard while the operator needs the terminal."""
+        with self.lock:
+            self.pause_depth += 1
+            if self.live:
+                self.live.stop()
+                self.live = None
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.pause_depth -= 1
+                if self.pause_depth == 0 and self.active:
+                    self.live = self.new_live()
+
+    @contextmanager
+    def activity(self, label, eta=None):
+        """Show an activity (and this thread's child output) until it ends."""
+        activity = Activity(label, eta)
+        key = next(self.ids)
+        with self.lock:
+            self.activities[key] = activity
+        previous = getattr(self.current, "activity", None)
+        self.current.activity = activity
+        try:
+            yield activity
+        finally:
+            self.current.activity = previous
+            with self.lock:
+                del self.activities[key]
+            if self.pending_lines:
+                self.refresh()  # keep its output ahead of whatever comes next
+
+    def status(self, message):
+        """Like console.status, which cannot run alongside the dashboard."""
+        if self.active:
+            return self.activity(message)
+        return console.status(message)
+
+    def output(self, line, echo=True):
+        """Take one line of child output for this thread's activity."""
+        if not self.active:
+            if echo:
+                sys.stdout.write(line)
+            return
+        line = line.rstrip("\r\n")
+        if activity := getattr(self.current, "activity", None):
+            activity.tail.append(line)
+        if echo:
+            with self.lock:
+                self.pending_lines.append(line)
+
+    def __rich__(self):
+        from rich.panel import Panel
+        from rich.table import Table
+        from rich.text import Text
+
+        now = time.monotonic()
+        table = Table.grid(padding=(0, 2), expand=True)
+        table.add_column(ratio=1, no_wrap=True, overflow="ellipsis")
+        table.add_column(justify="right")
+        table.add_column(justify="right", style="bright_black")
+        for activity in list(self.activities.values()):
+            elapsed = now - activity.started
+            if activity.eta is None:
+                eta = ""
+            elif elapsed < activity.eta:
+                eta = f"~{format_seconds(activity.eta - elapsed)} left"
+            else:
+                eta = f"usually {format_seconds(activity.eta)}"
+            table.add_row(
+                Text(activity.label, style="bold"), format_seconds(elapsed), eta
+            )
+            for line in list(activity.tail):
+                table.add_row(Text(f"  {line}", style="bright_black"), "", "")
+        return Panel(table, title="discobuilder", title_align="left")
+
+
+dashboard = Dashboard()
@@ -0,0 +1,113 @@
+"""
+Advisory file locks for repos and caches shared between discobuilder processes.
+
+Several discobuilder processes (interactive containers or build service
+workers) may share the same mounted /repos. Each repo work tree and cache gets
+a lock file under LOCK_DIR: fetches and inspection take it shared, while
+anything that changes the work tree (clone, checkout, commit) or deletes
+files takes it exclusively. Locks are re-entrant within a thread, so a
+pipeline can hold a repo exclusively while the adapters it calls lock it too.
+A pipeline keeps its repo locked from checkout until the push, prompts
+included, so no other process can switch branches in the middle of a build.
+"""
+
+import fcntl
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from discobuilder import config, console, metrics
+
+# lock name -> seconds spent waiting for each contended acquisition
+wait_times = defaultdict(list)
+
+locks = {}
+locks_guard = threading.Lock()
+
+
+class LockBusy(Exception):
+    pass
+
+
+class FileLock:
+    def __init__(self, name):
+        self.name = name
+        self.path = Path(config.LOCK_DIR) / f"{name}.lock"
+        # threads within this process take turns; flock arbitrates processes
+        self.thread_lock = threading.RLock()
+        self.lock_file = None
+        self.exclusive = False
+        self.depth = 0
+
+    def flock(self, operation):
+        try:
+            fcntl.flock(self.lock_file, operation | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            pass
+        mode = "exclusive" if operation == fcntl.LOCK_EX else "shared"
+        console.print(
+            f"Waiting for {mode} lock on {self.name} held by another process...",
+            style="bright_black",
+        )
+        started = time.monotonic()
+        fcntl.flock(self.lock_file, operation)
+        wait_times[self.name].append(time.monotonic() - started)
+        metrics.record("lock_wait_seconds", wait_times[self.name][-1], lock=self.name)
+
+    @contextmanager
+    def acquire(self, exclusive=True, yield_to_threads=False):
+        """
+        Hold the lock, shared or exclusive, until the context exits.
+
+        With `yield_to_threads`, raise LockBusy instead of waiting when another
+        thread in this process holds the lock. Background work uses this so it
+        never blocks a foreground thread that holds the lock and waits on it.
+        """
+        if not self.thread_lock.acquire(blocking=not yield_to_threads):
+            raise LockBusy(f"{self.name} is in use by another thread")
+        try:
+            if self.depth == 0:
+                self.open(exclusive)
+            elif exclusive and not self.exclusive:
+                self.flock(fcntl.LOCK_EX)
+                self.exclusive = True
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.close()
+        finally:
+            self.thread_lock.release()
+
+    def open(self, exclusive):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock_file = self.path.open("a+")
+        self.flock(fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self.exclusive = exclusive
+
+    def close(self):
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.lock_file.close()
+        self.lock_file = None
+
+
+def get_lock(name):
+    with locks_guard:
+        if name not in locks:
+            locks[name] = FileLock(name)
+        return locks[name]
+
+
+def repo_lock(local_path, exclusive=True, yield_to_threads=False):
+    name = re.sub(r"[^\w.-]", "_", str(Path(local_path).resolve()).strip("/"))
+    return get_lock(f"repo-{name}").acquire(exclusive, yield_to_threads)
+
+
+def rpmbuild_lock(exclusive=True):
+    return get_lock("rpmbuild").acquire(exclusive)
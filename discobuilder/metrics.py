@@ -0,0 +1,209 @@
+"""
+Keep a history of build metrics in an append-only JSON Lines store.
+
+Every measurement is one line: a metric name, a value, and labels such as
+product, release branch, stage, and outcome. The current product and branch
+come from `context`, which the running pipeline's Checkpoint keeps up to date
+for its own thread, so adapters only say what they measured. After each build, the whole history
+is summarized into a Prometheus/OpenMetrics textfile, and `python3 -m
+discobuilder stats` prints percentiles for it.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+from pathlib import Path
+
+from discobuilder import config, console, warning
+
+QUANTILES = (0.5, 0.9, 0.99)
+HELP = {
+    "stage_seconds": "Time spent in each pipeline stage",
+    "run_seconds": "Time from starting a product's pipeline until it ended",
+    "prefetch_seconds": "Time spent cloning or fetching repos in the background",
+    "lock_wait_seconds": "Time spent waiting for a lock held by another process",
+    "cache_hit": "1 when a cache or prefetch was used, 0 when it was missed",
+    "srpm_bytes": "Size of each SRPM given to rhpkg import",
+    "import_seconds": "Time spent in rhpkg import (including uploads)",
+    "brew_queue_seconds": "Time a brew task waited before a builder took it",
+    "brew_run_seconds": "Time a brew task ran on a builder",
+}
+
+# labels for everything measured by the pipeline running in this context;
+# always replaced with a new dict, never changed in place
+context = ContextVar("metrics_context")
+write_lock = threading.Lock()
+
+
+def record(metric, value, **labels):
+    """Append one measurement, labeled with the current context, to the store."""
+    if not config.METRICS:
+        return
+    entry = {
+        "time": time.time(),
+        "metric": metric,
+        "value": value,
+        "labels": {
+            key: str(label)
+            for key, label in {**context.get({}), **labels}.items()
+            if label is not None
+        },
+    }
+    try:
+        metrics_path = Path(config.METRICS_PATH)
+        with write_lock:
+            metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            with metrics_path.open("a") as metrics_file:
+                metrics_file.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        warning(f"Could not record metric {metric}: {e}")
+
+
+@contextmanager
+def timer(metric, **labels):
+    """Record how long the block took, labeled with its outcome."""
+    started = time.monotonic()
+    outcome = "failed"
+    try:
+        yield
+        outcome = "succeeded"
+    finally:
+        record(metric, time.monotonic() - started, outcome=outcome, **labels)
+
+
+def load(since=None):
+    """Read every measurement in the store, optionally only those after `since`."""
+    entries = []
+    try:
+        with open(config.METRICS_PATH, "r") as metrics_file:
+            for line in metrics_file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # e.g. a line cut short by a crash
+                if since is None or entry["time"] >= since:
+                    entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+@cache
+def history():
+    """Load past measurements once per process, e.g. for estimates."""
+    return load()
+
+
+def estimate(metric, **labels):
+    """Return the median of past values whose labels match, or None."""
+    values = sorted(
+        entry["value"]
+        for entry in history()
+        if entry["metric"] == metric
+        and all(entry["labels"].get(key) == str(value) for key, value in labels.items())
+    )
+    return percentile(values, 0.5) if values else None
+
+
+def percentile(sorted_values, fraction):
+    """Linearly interpolate a percentile from already sorted values."""
+    position = (len(sorted_values) - 1) * fraction
+    lower, upper = math.floor(position), math.ceil(position)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (
+        position - lower
+    )
+
+
+def summarize(entries, ignore_labels=("run",)):
+    """Group values by metric and labels: {(metric, labels): sorted values}."""
+    groups = defaultdict(list)
+    for entry in entries:
+        labels = tuple(
+            sorted(
+                (key, value)
+                for key, value in entry["labels"].items()
+                if key not in ignore_labels
+            )
+        )
+        groups[(entry["metric"], labels)].append(entry["value"])
+    return {key: sorted(values) for key, values in sorted(groups.items())}
+
+
+def escape_label(value):
+    return re.sub(r'(["\\])', r"\\\1", value).replace("\n", "\\n")
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return (
+        "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in pairs) + "}"
+    )
+
+
+def render_openmetrics(summary):
+    lines = []
+    described = set()
+    for (metric, labels), values in summary.items():
+        name = f"discobuilder_{metric}"
+        if metric not in described:
+            described.add(metric)
+            lines.append(f"# HELP {name} {HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {name} summary")
+        for fraction in QUANTILES:
+            lines.append(
+                f"{name}{format_labels(labels, quantile=str(fraction))} "
+                f"{percentile(values, fraction)}"
+            )
+        lines.append(f"{name}_sum{format_labels(labels)} {sum(values)}")
+        lines.append(f"{name}_count{format_labels(labels)} {len(values)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile():
+    """Rewrite the metrics textfile (e.g. for node_exporter) from the store."""
+    if not (config.METRICS and config.METRICS_TEXTFILE):
+        return
+    textfile_path = Path(config.METRICS_TEXTFILE)
+    try:
+        textfile_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = textfile_path.with_suffix(".tmp")
+        temp_path.write_text(render_openmetrics(summarize(load())))
+        os.replace(temp_path, textfile_path)
+    except OSError as e:
+        warning(f"Could not write metrics to {textfile_path}: {e}")
+
+
+def show_stats(product=None, days=None, metric=None):
+    from rich.table import Table
+
+    since = time.time() - days * 86400 if days else None
+    entries = [
+        entry
+        for entry in load(since)
+        if (not product or entry["labels"].get("product") == product)
+        and (not metric or entry["metric"] == metric)
+    ]
+    if not entries:
+        console.print("No metrics recorded yet.")
+        return
+
+    table = Table("metric", "labels", "count", "p50", "p90", "p99", "max")
+    for (name, labels), values in summarize(entries).items():
+        table.add_row(
+            name,
+            " ".join(f"{key}={value}" for key, value in labels),
+            str(len(values)),
+            *(f"{percentile(values, fraction):.2f}" for fraction in QUANTILES),
+            f"{values[-1]:.2f}",
+        )
+    console.print(table)
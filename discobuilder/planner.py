@@ -0,0 +1,351 @@
+"""
+Plan a release without changing anything, for `--plan`/`--dry-run`.
+
+For each product, walk the same stages as its build_* pipeline using only
+read-only inspection: the local repo and its checkpoint, remote branches
+(`git ls-remote`), the spec or sources-version.yaml on the release branch as
+last fetched, and upstream versions (reading but never updating the tag
+cache). Each stage is shown as run, skip, ask (depends on a prompt without a
+preset answer), or resume (saved by the last run), with its median duration
+from recorded metrics. Nothing is fetched, written, pushed, or built.
+"""
+
+import json
+import re
+from os import path
+from pathlib import Path
+from typing import NamedTuple
+
+import discobuilder
+from discobuilder import config, console, metrics, upstream
+from discobuilder.adapter.subprocess import subprocess_run
+from discobuilder.dashboard import format_seconds
+from discobuilder.prefetch import BACKGROUND_ENV
+
+RUN = "run"
+SKIP = "skip"
+ASK = "ask"
+RESUME = "resume"
+STYLES = {RUN: "green", SKIP: "bright_black", ASK: "orange1", RESUME: "cyan"}
+
+
+class PlannedStage(NamedTuple):
+    name: str
+    status: str
+    detail: str
+    estimate: float | None
+
+
+def git_output(args, cwd=None):
+    """Run a read-only git command and return its output, or None if it failed."""
+    git_run = subprocess_run(
+        ["git", *args],
+        cwd=cwd,
+        env=BACKGROUND_ENV,
+        capture_output=True,
+        show_command=False,
+        timeout=60,
+    )
+    return git_run.stdout.decode() if git_run.returncode == 0 else None
+
+
+def is_git_repo(repo_path):
+    return path.isdir(path.join(repo_path, ".git"))
+
+
+def remote_branches(repo_path, origin_url):
+    if is_git_repo(repo_path):
+        origin_url = (
+            git_output(["remote", "get-url", "origin"], repo_path) or ""
+        ).strip()
+    if not (heads := git_output(["ls-remote", "--heads", origin_url])):
+        return None
+    return sorted(
+        f"remotes/origin/{line.split('refs/heads/', 1)[1]}"
+        for line in heads.splitlines()
+        if "refs/heads/" in line
+    )
+
+
+def show_file(repo_path, base_branch, file_name):
+    """Read a file from the release branch as of the last fetch, if possible."""
+    if not is_git_repo(repo_path):
+        return None
+    ref = base_branch.removeprefix("remotes/")
+    return git_output(["show", f"{ref}:{file_name}"], repo_path)
+
+
+def answered(key):
+    return key in discobuilder.answers
+
+
+class ProductPlan:
+    def __init__(self, product, repo_path, origin_url):
+        self.product = product
+        self.repo_path = repo_path
+        self.origin_url = origin_url.format(username=config.KERBEROS_USERNAME)
+        self.stages = []
+        self.notes = []
+        self.saved_stages = self.load_checkpoint()
+        self.resuming = bool(self.saved_stages)
+
+    def load_checkpoint(self):
+        if not config.RESUME:
+            return {}
+        checkpoint_path = Path(config.CHECKPOINT_DIR) / f"{self.product}.json"
+        try:
+            saved = json.loads(checkpoint_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        return {} if saved.get("finished") else saved.get("stages", {})
+
+    def add(self, name, status, detail=""):
+        # like Checkpoint.completed: only an unbroken run of saved stages resumes
+        if self.resuming and name in self.saved_stages and status != SKIP:
+            status, detail = RESUME, f"saved by the last run if still valid; {detail}"
+        elif status != SKIP:
+            self.resuming = False
+        estimate = metrics.estimate(
+            "stage_seconds", product=self.product, stage=name, outcome="succeeded"
+        )
+        self.stages.append(PlannedStage(name, status, detail, estimate))
+
+    def add_repo(self, name="set_up_repo"):
+        if not is_git_repo(self.repo_path):
+            self.add(name, RUN, f"clone {self.origin_url}")
+            return
+        current = (
+            git_output(["branch", "--show-current"], self.repo_path) or ""
+        ).strip()
+        self.add(
+            name, RUN, f"fetch and fast-forward master (local clone is on {current})"
+        )
+
+    def add_automate(self):
+        """Plan the automate prompt and return False if the rest is manual."""
+        if not answered("automate"):
+            self.add("automate", ASK, "asks whether to automate (default yes)")
+            return True
+        if not discobuilder.answers["automate"]:
+            self.add("automate", SKIP, "not automating; next steps are printed")
+            return False
+        self.add("automate", RUN, "automating version updates")
+        return True
+
+    def add_branch(self, branch_prefix, default_branch):
+        base_branch = discobuilder.answer("release_branch", default_branch)
+        branches = remote_branches(self.repo_path, self.origin_url)
+        if branches is None:
+            found = "could not list remote branches"
+        elif base_branch in branches:
+            found = f"1 of {len(branches)} remote branches"
+        else:
+            found = "not found on the remote"
+            self.notes.append(f"release branch {base_branch} was not found")
+        if answered("release_branch"):
+            self.add("branch", RUN, f"{base_branch} ({found})")
+        else:
+            self.add(
+                "branch", ASK, f"asks for the release branch, default {base_branch}"
+            )
+        if branches:
+            others = [branch for branch in branches if branch.startswith(branch_prefix)]
+            if len(others) > 1:
+                self.notes.append(f"release branches: {', '.join(others)}")
+        return base_branch
+
+    def add_scratch(self, target):
+        if not answered("scratch"):
+            self.add(
+                "scratch_build", ASK, f"asks whether to build {target} (default yes)"
+            )
+        elif discobuilder.answers["scratch"]:
+            self.add("scratch_build", RUN, f"scratch build for {target}")
+        else:
+            self.add("scratch_build", SKIP, "no scratch build")
+
+    @property
+    def total(self):
+        return sum(
+            stage.estimate or 0 for stage in self.stages if stage.status in (RUN, ASK)
+        )
+
+
+def plan_cli():
+    plan = ProductPlan(
+        "cli", config.DISCOVERY_CLI_GIT_REPO_PATH, config.DISCOVERY_CLI_GIT_URL
+    )
+    plan.add("purge", RUN, "start an empty rpmbuild tree for this run")
+    plan.add_repo()
+    if not plan.add_automate():
+        return plan
+    base_branch = plan.add_branch(
+        config.DISCOVERY_CLI_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
+        config.DISCOVERY_CLI_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
+    )
+    spec = show_file(plan.repo_path, base_branch, "discovery-cli.spec") or ""
+    version_match = re.search(r"^Version:\s*(.+)$", spec, re.MULTILINE)
+    current = version_match and version_match.group(1).strip()
+
+    if not version_match:
+        plan.add("spec", ASK, f"discovery-cli.spec is not readable on {base_branch}")
+        rebuild, detail = ASK, "only if the version changes"
+    elif not answered("version.version"):
+        plan.add("spec", ASK, f"asks for the new version (now {current})")
+        rebuild, detail = ASK, "only if the version changes"
+    elif (new_version := str(discobuilder.answers["version.version"])) == current:
+        plan.add("spec", RUN, f"version stays {current}")
+        rebuild, detail = SKIP, "version unchanged"
+    else:
+        plan.add("spec", RUN, f"version {current} → {new_version}")
+        rebuild, detail = RUN, f"for {new_version}"
+    for name in ("srpm", "commit_spec", "validate", "import"):
+        plan.add(name, rebuild, detail)
+
+    plan.add("push", RUN, f"force-push {config.PRIVATE_BRANCH_NAME}")
+    plan.add_scratch(f"{base_branch.split('/')[-1]}-candidate")
+    return plan
+
+
+def plan_installer():
+    from discobuilder.builder.installer import SPEC_GLOBALS
+
+    plan = ProductPlan(
+        "installer",
+        config.DISCOVERY_INSTALLER_GIT_REPO_PATH,
+        config.DISCOVERY_INSTALLER_GIT_URL,
+    )
+    plan.add("purge", RUN, "start an empty rpmbuild tree for this run")
+    plan.add_repo()
+    if not plan.add_automate():
+        return plan
+    base_branch = plan.add_branch(
+        config.DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
+        config.DISCOVERY_INSTALLER_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
+    )
+    spec = show_file(plan.repo_path, base_branch, "discovery-installer.spec") or ""
+
+    refresh = discobuilder.answer("refresh_spec", True)
+    if refresh:
+        import requests
+
+        committish = discobuilder.answer("upstream_committish", "main")
+        url = config.QUIPUCORDS_INSTALLER_SPEC_URL.format(committish)
+        try:
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+            upstream_spec = response.text
+            refreshed = (
+                "differs from" if upstream_spec != spec else "is identical to"
+            ) + f" {base_branch}"
+            spec = upstream_spec
+        except requests.RequestException as e:
+            refreshed = f"could not be fetched ({e})"
+        detail = f"upstream spec at {committish} {refreshed}"
+    else:
+        detail = "keeps the current spec"
+
+    changes = []
+    for spec_global in SPEC_GLOBALS:
+        if match := re.search(rf"^%global {spec_global} (\S*)", spec, re.MULTILINE):
+            new_value = str(
+                discobuilder.answer(f"version.{spec_global}", match.group(1))
+            )
+            if new_value != match.group(1):
+                changes.append(f"{spec_global} {match.group(1)} → {new_value}")
+    if changes:
+        detail += "; " + ", ".join(changes)
+    keys = ["refresh_spec"] + [f"version.{name}" for name in SPEC_GLOBALS]
+    if refresh:
+        keys.append("upstream_committish")
+    asks = not all(answered(key) for key in keys)
+    plan.add("spec", ASK if asks else RUN, detail)
+
+    # the pipeline rebuilds whenever it refreshed or rewrote any %global
+    rebuild = refresh or any(
+        re.search(rf"^%global {name} ", spec, re.MULTILINE) for name in SPEC_GLOBALS
+    )
+    for name in ("srpm", "commit_spec", "validate", "import"):
+        plan.add(name, RUN if rebuild else SKIP, "" if rebuild else "spec unchanged")
+
+    plan.add("push", RUN, f"force-push {config.PRIVATE_BRANCH_NAME}")
+    plan.add_scratch(f"{base_branch.split('/')[-1]}-candidate")
+    return plan
+
+
+def plan_server():
+    import yaml
+
+    plan = ProductPlan(
+        "server", config.DISCOVERY_SERVER_GIT_REPO_PATH, config.DISCOVERY_SERVER_GIT_URL
+    )
+    chaski_state = "warm" if is_git_repo(config.CHASKI_GIT_REPO_PATH) else "cold"
+    plan.add("set_up_chaski", RUN, f"update chaski and poetry install ({chaski_state})")
+    plan.add_repo()
+    if not plan.add_automate():
+        return plan
+    base_branch = plan.add_branch(
+        config.DISCOVERY_SERVER_GIT_REMOTE_RELEASE_BRANCH_PREFIX,
+        config.DISCOVERY_SERVER_GIT_REMOTE_RELEASE_BRANCH_DEFAULT,
+    )
+
+    if not (text := show_file(plan.repo_path, base_branch, "sources-version.yaml")):
+        plan.add("sources", ASK, "sources-version.yaml is not available locally yet")
+    else:
+        sources_versions = yaml.safe_load(text)
+        resolved = upstream.resolve_versions(sources_versions, save_cache=False)
+        changes = []
+        for key, value in sources_versions.items():
+            proposed = resolved[key][1] or value
+            new_value = str(discobuilder.answer(f"version.{key}", proposed))
+            if new_value != str(value):
+                changes.append(f"{key} {value} → {new_value}")
+        status = RUN if answered("accept_versions") else ASK
+        if changes:
+            plan.add("sources", status, ", ".join(changes))
+        else:
+            plan.add("sources", status, "no newer upstream versions")
+            plan.notes.append("no version changes; this product may not need a build")
+
+    plan.add("chaski", RUN, "update-remote-sources and update-rust-deps")
+    plan.add("commit", RUN, "commit the regenerated files")
+    plan.add("push", RUN, f"force-push {config.PRIVATE_BRANCH_NAME}")
+    plan.add_scratch(f"{base_branch.split('/')[-1]}-containers-candidate")
+    return plan
+
+
+PLANNERS = {"server": plan_server, "cli": plan_cli, "installer": plan_installer}
+
+
+def show_plan(plans):
+    from rich.markup import escape
+    from rich.tree import Tree
+
+    tree = Tree("[b]Build plan[/b] (dry run: nothing was changed)")
+    for plan in plans:
+        product = tree.add(
+            f"[b]{plan.product}[/b]  ~{format_seconds(plan.total)}", guide_style="dim"
+        )
+        for stage in plan.stages:
+            estimate = format_seconds(stage.estimate) if stage.estimate else "?"
+            style = STYLES[stage.status]
+            product.add(
+                f"[{style}]{stage.status:<6}[/{style}] {stage.name:<14} {estimate:>6}"
+                f"  [bright_black]{escape(stage.detail)}[/bright_black]"
+            )
+        for note in plan.notes:
+            product.add(f"[orange1]note:[/orange1] {escape(note)}")
+    console.print(tree)
+
+    total = sum(plan.total for plan in plans)
+    console.print(
+        f"Estimated total ~{format_seconds(total)} from past runs; "
+        "stages marked ask are counted, and ? means no history yet."
+    )
+
+
+def plan(products):
+    # never prompt, and never record inspection as if it were a build
+    discobuilder.interactive = False
+    config.METRICS = False
+    show_plan([PLANNERS[product]() for product in products])
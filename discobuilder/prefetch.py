@@ -0,0 +1,143 @@
+"""
+Clone or fetch every repo in the background while the operator answers prompts.
+
+`start` is called as soon as discobuilder launches, unless PREFETCH=0. chaski
+needs no credentials, so its clone and `poetry install` begin immediately. The
+dist-git repos need a Kerberos ticket, so they begin once one is present or
+once `credentials_ready` is set after kinit, and like other remote operations
+they pause while the ticket manager has no usable ticket. Pipeline stages call
+`wait` for their repo, and only fall back to doing the work themselves if
+prefetching failed.
+"""
+
+import threading
+from concurrent.futures import Future
+from os import environ, path
+from subprocess import DEVNULL
+
+from discobuilder import config, metrics, warning
+from discobuilder.adapter.kerberos import requires_ticket
+from discobuilder.adapter.subprocess import subprocess_call
+from discobuilder.dashboard import dashboard
+from discobuilder.lock import repo_lock
+
+# never let a background git command stop and wait for a password or host key
+BACKGROUND_ENV = {
+    **environ,
+    "GIT_TERMINAL_PROMPT": "0",
+    "GIT_SSH_COMMAND": "ssh -o BatchMode=yes",
+}
+
+credentials_ready = threading.Event()
+futures = {}
+
+
+class PrefetchFailure(Exception):
+    pass
+
+
+def background_call(args, cwd=None):
+    return subprocess_call(
+        args,
+        cwd=cwd,
+        env=BACKGROUND_ENV,
+        stdout=DEVNULL,
+        stderr=DEVNULL,
+        show_command=False,
+    )
+
+
+def clone_or_fetch(origin_url, local_path):
+    cloning = not path.isdir(local_path)
+    if cloning:
+        args, cwd = ["git", "clone", "--quiet", origin_url, local_path], None
+    else:
+        args, cwd = ["git", "fetch", "--all", "--prune", "--quiet"], local_path
+    labels = {
+        "repo": path.basename(local_path),
+        "operation": "clone" if cloning else "fetch",
+    }
+    with (
+        repo_lock(local_path, exclusive=cloning, yield_to_threads=True),
+        dashboard.activity(
+            f"prefetch: {labels['operation']} {labels['repo']}",
+            metrics.estimate("prefetch_seconds", outcome="succeeded", **labels),
+        ),
+        metrics.timer("prefetch_seconds", **labels),
+    ):
+        if background_call(args, cwd=cwd) != 0:
+            raise PrefetchFailure(f"Failed to prefetch {origin_url} to {local_path}")
+
+
+def warm_chaski():
+    clone_or_fetch(config.CHASKI_GIT_URL, config.CHASKI_GIT_REPO_PATH)
+    with (
+        repo_lock(config.CHASKI_GIT_REPO_PATH, yield_to_threads=True),
+        dashboard.activity("prefetch: poetry install chaski"),
+    ):
+        for args in (
+            ["git", "checkout", "--quiet", config.CHASKI_GIT_COMMITTISH],
+            ["git", "merge", "--ff-only", "--quiet", "@{upstream}"],
+            ["python3", "-m", "poetry", "install", "-C", config.CHASKI_GIT_REPO_PATH],
+        ):
+            if background_call(args, cwd=config.CHASKI_GIT_REPO_PATH) != 0:
+                raise PrefetchFailure(f"Failed `{' '.join(args)}` while warming chaski")
+
+
+def has_ticket():
+    return background_call([config.KLIST_COMMAND, "-s"]) == 0
+
+
+def fetch_distgit(origin_url, local_path):
+    if not (config.KERBEROS_USERNAME and has_ticket()):
+        credentials_ready.wait()
+    requires_ticket(clone_or_fetch)(
+        origin_url.format(username=config.KERBEROS_USERNAME), local_path
+    )
+
+
+def submit(function, *args):
+    """
+    Run a function on a daemon thread and return a Future for its result.
+
+    Daemon threads (unlike a ThreadPoolExecutor's) never hold up exiting, e.g.
+    when the operator quits while a prefetch still waits for credentials.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(function(*args))
+        except Exception as e:  # noqa: BLE001 - re-raised by future.result()
+            future.set_exception(e)
+
+    threading.Thread(
+        target=run, name=f"prefetch-{function.__name__}", daemon=True
+    ).start()
+    return future
+
+
+def start():
+    if futures or not config.PREFETCH:
+        return
+    futures[config.CHASKI_GIT_REPO_PATH] = submit(warm_chaski)
+    for origin_url, local_path in (
+        (config.DISCOVERY_SERVER_GIT_URL, config.DISCOVERY_SERVER_GIT_REPO_PATH),
+        (config.DISCOVERY_CLI_GIT_URL, config.DISCOVERY_CLI_GIT_REPO_PATH),
+        (config.DISCOVERY_INSTALLER_GIT_URL, config.DISCOVERY_INSTALLER_GIT_REPO_PATH),
+    ):
+        futures[local_path] = submit(fetch_distgit, origin_url, local_path)
+
+
+def wait(local_path):
+    """Wait for a repo's prefetch and return True if it is ready to use as-is."""
+    if not (future := futures.pop(local_path, None)):
+        return False
+    try:
+        future.result()
+    except (PrefetchFailure, OSError) as e:
+        warning(f"{e}; falling back to the usual setup.")
+        metrics.record("cache_hit", 0, cache="prefetch", repo=path.basename(local_path))
+        return False
+    metrics.record("cache_hit", 1, cache="prefetch", repo=path.basename(local_path))
+    return True
@@ -0,0 +1,210 @@
+import os
+import shutil
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import cache
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import urlparse
+
+from discobuilder import config, console
+from discobuilder.adapter.kerberos import get_ticket_times
+from discobuilder.adapter.subprocess import subprocess_run
+
+OK = "ok"
+WARNING = "warning"
+FAILED = "failed"
+
+# tool name -> arguments that print its version (None if it has no such flag)
+REQUIRED_TOOLS = {
+    "git": ["git", "--version"],
+    "klist": None,
+    "kinit": None,
+    "rhpkg": ["rhpkg", "--version"],
+    "rpmbuild": ["rpmbuild", "--version"],
+    "rpmdev-setuptree": None,
+    "spectool": ["spectool", "--version"],
+    "cargo": ["cargo", "--version"],
+    "poetry": ["python3", "-m", "poetry", "--version"],
+}
+DEFAULT_PORTS = {
+    "ssh": 22,
+    "git+ssh": 22,
+    "ssh+git": 22,
+    "https": 443,
+    "http": 80,
+    "git": 9418,
+}
+
+
+class CheckResult(NamedTuple):
+    name: str
+    status: str
+    detail: str
+    seconds: float
+
+
+def distgit_urls():
+    return [
+        url.format(username=config.KERBEROS_USERNAME)
+        for url in (
+            config.DISCOVERY_SERVER_GIT_URL,
+            config.DISCOVERY_CLI_GIT_URL,
+            config.DISCOVERY_INSTALLER_GIT_URL,
+        )
+    ]
+
+
+def repo_paths():
+    return [
+        config.CHASKI_GIT_REPO_PATH,
+        config.DISCOVERY_SERVER_GIT_REPO_PATH,
+        config.DISCOVERY_CLI_GIT_REPO_PATH,
+        config.DISCOVERY_INSTALLER_GIT_REPO_PATH,
+    ]
+
+
+def check_tool(name, version_args):
+    if not shutil.which(version_args[0] if version_args else name):
+        return FAILED, "not found on PATH"
+    if not version_args:
+        return OK, "present"
+    version_run = subprocess_run(version_args, capture_output=True, timeout=30)
+    if version_run.returncode != 0:
+        return FAILED, f"`{' '.join(version_args)}` exited {version_run.returncode}"
+    output = (version_run.stdout or version_run.stderr).decode().strip()
+    return OK, output.splitlines()[0] if output else "present"
+
+
+def check_kerberos_ticket():
+    if not (ticket_times := get_ticket_times()):
+        return FAILED, "no ticket in the credential cache"
+    remaining = ticket_times.expires - datetime.now()
+    if remaining.total_seconds() <= 0:
+        return FAILED, f"ticket expired at {ticket_times.expires}"
+    detail = f"expires in {str(remaining).split('.')[0]}"
+    if remaining.total_seconds() < config.PREFLIGHT_MIN_TICKET_SECONDS:
+        return WARNING, detail
+    return OK, detail
+
+
+def check_known_hosts(host):
+    known_hosts = Path.home() / ".ssh" / "known_hosts"
+    if not os.access(known_hosts, os.R_OK):
+        return FAILED, f"{known_hosts} is not readable"
+    lookup = subprocess_run(
+        ["ssh-keygen", "-F", host, "-f", str(known_hosts)], capture_output=True
+    )
+    if lookup.returncode != 0:
+        return FAILED, f"no entry for {host} in {known_hosts}"
+    return OK, f"{host} is known"
+
+
+def check_writable(local_path):
+    existing = Path(local_path)
+    while not existing.exists():
+        existing = existing.parent
+    if not os.access(existing, os.W_OK):
+        return FAILED, f"{existing} is not writable"
+    return OK, f"{existing} is writable"
+
+
+def check_free_space(local_path):
+    existing = Path(local_path)
+    while not existing.exists():
+        existing = existing.parent
+    free_gb = shutil.disk_usage(existing).free / 1024**3
+    detail = f"{free_gb:.1f} GiB free at {existing}"
+    if free_gb < config.PREFLIGHT_MIN_FREE_GB:
+        return FAILED, detail
+    return OK, detail
+
+
+def check_reachable(host, port):
+    try:
+        with socket.create_connection((host, port), timeout=5):
+            return OK, f"connected to {host}:{port}"
+    except OSError as e:
+        return FAILED, f"cannot connect to {host}:{port} ({e})"
+
+
+def report_unchecked(url, reason):
+    return WARNING, f"not checked: {url} ({reason})"
+
+
+def get_checks():
+    """Build the list of (name, function, args) environment checks to run."""
+    checks = [
+        (f"tool {name}", check_tool, (name, version_args))
+        for name, version_args in REQUIRED_TOOLS.items()
+    ]
+    checks.append(("kerberos ticket", check_kerberos_ticket, ()))
+
+    remotes = set()
+    for url in distgit_urls() + [
+        config.CHASKI_GIT_URL,
+        config.QUIPUCORDS_INSTALLER_SPEC_URL,
+    ]:
+        parsed = urlparse(url)
+        if not parsed.hostname:
+            reason = "no host in URL, e.g. scp-style user@host:path"
+            checks.append((f"reach {url}", report_unchecked, (url, reason)))
+        elif not (port := parsed.port or DEFAULT_PORTS.get(parsed.scheme)):
+            reason = f"unknown default port for '{parsed.scheme}'"
+            checks.append((f"reach {url}", report_unchecked, (url, reason)))
+        else:
+            remotes.add((DEFAULT_PORTS.get(parsed.scheme) == 22, parsed.hostname, port))
+    for is_ssh, host, port in sorted(remotes):
+        checks.append((f"reach {host}:{port}", check_reachable, (host, port)))
+        if is_ssh:
+            checks.append((f"known_hosts {host}", check_known_hosts, (host,)))
+
+    for local_path in repo_paths():
+        checks.append((f"writable {local_path}", check_writable, (local_path,)))
+    for local_path in sorted(
+        {str(Path(config.CHASKI_GIT_REPO_PATH).parent), str(Path.home() / "rpmbuild")}
+    ):
+        checks.append((f"free space {local_path}", check_free_space, (local_path,)))
+    return checks
+
+
+def run_check(name, function, args):
+    started = time.monotonic()
+    try:
+        status, detail = function(*args)
+    except Exception as e:  # noqa: BLE001 - any broken check is a failed check
+        status, detail = FAILED, f"{type(e).__name__}: {e}"
+    return CheckResult(name, status, detail, time.monotonic() - started)
+
+
+@cache
+def run_preflight():
+    """Run every environment check concurrently, once per session."""
+    checks = get_checks()
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        futures = [executor.submit(run_check, *check) for check in checks]
+        return [future.result() for future in futures]
+
+
+def show_report(results, title="Preflight checks"):
+    from rich.table import Table
+
+    styles = {OK: "green", WARNING: "orange1", FAILED: "red"}
+    table = Table("check", "status", "detail", "time", title=title)
+    for result in results:
+        table.add_row(
+            result.name,
+            f"[{styles[result.status]}]{result.status}[/{styles[result.status]}]",
+            result.detail,
+            f"{result.seconds:.2f}s",
+        )
+    console.print(table)
+
+
+def preflight():
+    """Show the preflight report and return True if no check failed."""
+    results = run_preflight()
+    show_report(results)
+    return not any(result.status == FAILED for result in results)
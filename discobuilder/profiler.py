@@ -0,0 +1,162 @@
+"""
+Sample where discobuilder spends its time, for `--profile`.
+
+A background thread samples every thread's Python stack at a fixed interval
+and counts them as collapsed stacks (one "frame;frame;frame count" line each,
+as read by flamegraph.pl, speedscope, and similar tools). Code that waits on
+something outside Python marks it with `waiting`: the subprocess adapter
+marks each command, and the prompt helpers mark waiting on user input. Marked
+samples end in a "[subprocess: git]" or "[input: product]" frame, and the
+marked time on the main thread is totalled exactly for the summary.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import cache
+from pathlib import Path
+
+from discobuilder import config, console
+
+profiler = None
+
+
+def describe_frame(frame):
+    return describe_code(frame.f_code)
+
+
+@cache
+def describe_code(code):
+    file_name = "/".join(Path(code.co_filename).parts[-2:])
+    return f"{code.co_name} ({file_name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, output_path, interval=None):
+        self.output_path = Path(output_path)
+        self.interval = interval or config.PROFILE_INTERVAL_MS / 1000
+        self.stacks = Counter()
+        self.leaves = Counter()
+        self.markers = defaultdict(list)
+        self.waits = Counter()
+        self.main_ident = threading.main_thread().ident
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        self.started = time.monotonic()
+        self.started_cpu = time.thread_time()
+        self.sampler = threading.Thread(
+            target=self.sample_loop, name="profiler", daemon=True
+        )
+        self.sampler.start()
+
+    def sample_loop(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.sampler.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(describe_frame(frame))
+                frame = frame.f_back
+            stack.reverse()
+            # copy the top marker, as the sampled thread may pop it meanwhile
+            if top := self.markers.get(ident, [])[-1:]:
+                kind, detail = top[0]
+                stack.append(f"[{kind}: {detail}]")
+            elif stack:
+                self.leaves[stack[-1]] += 1
+            self.stacks[";".join([names.get(ident, str(ident))] + stack)] += 1
+
+    @contextmanager
+    def waiting(self, kind, detail):
+        ident = threading.get_ident()
+        markers = self.markers[ident]
+        markers.append((kind, detail))
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            markers.pop()
+            # count only the outermost wait, e.g. not a command run by a prompt
+            if ident == self.main_ident and not markers:
+                self.waits[(kind, detail)] += time.monotonic() - started
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+        wall = time.monotonic() - self.started
+        cpu = time.thread_time() - self.started_cpu
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.output_path.open("w") as output_file:
+            for stack, samples in self.stacks.most_common():
+                output_file.write(f"{stack} {samples}\n")
+        self.show_summary(wall, cpu)
+
+    def show_summary(self, wall, cpu):
+        from rich.table import Table
+
+        waits_by_kind = defaultdict(float)
+        for (kind, _), seconds in self.waits.items():
+            waits_by_kind[kind] += seconds
+        other = max(wall - cpu - sum(waits_by_kind.values()), 0)
+
+        def share(seconds):
+            return f"{seconds:.2f}s", f"{100 * seconds / wall:.0f}%" if wall else ""
+
+        table = Table(
+            "main thread", "time", "share", title=f"Profile ({wall:.1f}s wall)"
+        )
+        table.add_row("waiting on input", *share(waits_by_kind["input"]))
+        table.add_row("waiting on subprocesses", *share(waits_by_kind["subprocess"]))
+        subprocess_waits = Counter()
+        for (kind, detail), seconds in self.waits.items():
+            if kind == "subprocess":
+                subprocess_waits[detail] += seconds
+        for command, seconds in subprocess_waits.most_common():
+            table.add_row(f"  {command}", *share(seconds), style="bright_black")
+        table.add_row("Python CPU", *share(cpu))
+        table.add_row("other waits (network, locks, sleeps)", *share(other))
+        console.print(table)
+
+        if self.leaves:
+            hot = Table("Python function (all threads)", "samples", title="Hot spots")
+            for leaf, samples in self.leaves.most_common(10):
+                hot.add_row(leaf, str(samples))
+            console.print(hot)
+        console.print(f"Collapsed stacks written to {self.output_path}")
+
+
+def start(output_path=None):
+    global profiler
+    if output_path is None:
+        output_path = Path(config.PROFILE_DIR) / time.strftime(
+            f"discobuilder-%Y%m%d-%H%M%S-{os.getpid()}.folded"
+        )
+    profiler = SamplingProfiler(output_path)
+    profiler.start()
+
+
+def stop():
+    global profiler
+    if profiler is not None:
+        profiler.stop()
+        profiler = None
+
+
+@contextmanager
+def waiting(kind, detail):
+    """Mark this thread as waiting on something outside Python while profiling."""
+    if profiler is None:
+        yield
+        return
+    with profiler.waiting(kind, detail):
+        yield
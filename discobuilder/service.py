@@ -0,0 +1,410 @@
+"""
+Run discobuilder as a long-lived build service.
+
+Build jobs are submitted over a small HTTP API (on a TCP port or a Unix
+socket), persisted as JSON files under SERVICE_DIR, and run by a bounded pool
+of workers. Each job runs the usual build_* pipeline in its own child process
+with preset answers, so concurrent jobs share the warm repos, chaski
+virtualenv, and caches under /repos without sharing any in-process state.
+The API has no authentication, so only listen on localhost or a Unix socket.
+
+    POST   /jobs              submit a job, e.g. {"product": "cli",
+                              "branch": "remotes/origin/discovery-1-rhel-9",
+                              "versions": {"version": "1.2.3"},
+                              "release": "rhel-9", "target": "..."}
+    GET    /jobs              list jobs
+    GET    /jobs/<id>         show one job
+    GET    /jobs/<id>/log     read a job's log (optionally from ?offset=N)
+    POST   /jobs/<id>/cancel  cancel a queued or running job
+    DELETE /jobs/<id>         same as cancel
+"""
+
+import json
+import os
+import re
+import signal
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from subprocess import DEVNULL, STDOUT
+from urllib.parse import parse_qs, urlparse
+
+import discobuilder
+from discobuilder import config, console, warning
+from discobuilder.adapter.subprocess import subprocess_call, subprocess_popen
+from discobuilder.builder import BUILDERS, get_builder
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobError(Exception):
+    pass
+
+
+class JobStore:
+    """Persist each job as a JSON file and each job's output as a log file."""
+
+    def __init__(self, root):
+        self.jobs_dir = Path(root) / "jobs"
+        self.logs_dir = Path(root) / "logs"
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+
+    def job_path(self, job_id):
+        return self.jobs_dir / f"{job_id}.json"
+
+    def log_path(self, job_id):
+        return self.logs_dir / f"{job_id}.log"
+
+    def save(self, job):
+        temp_path = self.job_path(job["id"]).with_suffix(".tmp")
+        with temp_path.open("w") as job_file:
+            json.dump(job, job_file, indent=2)
+        os.replace(temp_path, self.job_path(job["id"]))
+
+    def load(self, job_id):
+        if not re.fullmatch(r"\w+", job_id):
+            return None
+        try:
+            with self.job_path(job_id).open("r") as job_file:
+                return json.load(job_file)
+        except FileNotFoundError:
+            return None
+
+    def all(self):
+        jobs = [self.load(job_path.stem) for job_path in self.jobs_dir.glob("*.json")]
+        return sorted((job for job in jobs if job), key=lambda job: job["created"])
+
+    def update(self, job_id, **changes):
+        with self.lock:
+            job = self.load(job_id)
+            job.update(changes)
+            self.save(job)
+            return job
+
+    def transition(self, job_id, from_status, **changes):
+        """Update a job only if it still has from_status, and return it if so."""
+        with self.lock:
+            job = self.load(job_id)
+            if not job or job["status"] != from_status:
+                return None
+            return self.update(job_id, **changes)
+
+
+SPEC_TYPES = {
+    "product": (str, "string"),
+    "branch": (str, "string"),
+    "versions": (dict, "object"),
+    "release": (str, "string"),
+    "target": (str, "string"),
+    "scratch": (bool, "boolean"),
+    "answers": (dict, "object"),
+}
+
+
+def check_spec_types(spec):
+    for key, (expected, json_type) in SPEC_TYPES.items():
+        if spec.get(key) is not None and not isinstance(spec[key], expected):
+            raise JobError(f"'{key}' must be a JSON {json_type}")
+    for key, value in (spec.get("versions") or {}).items():
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise JobError(f"'versions.{key}' must be a string or number")
+
+
+def new_job(spec):
+    """Turn a submitted job spec into a queued job with preset prompt answers."""
+    if not isinstance(spec, dict):
+        raise JobError("Job must be a JSON object")
+    check_spec_types(spec)
+    if (product := spec.get("product")) not in BUILDERS:
+        raise JobError(f"'product' must be one of {', '.join(BUILDERS)}")
+
+    answers = {"automate": True, "scratch": spec.get("scratch", True)}
+    if branch := spec.get("branch"):
+        answers["release_branch"] = branch
+    for key, value in (spec.get("versions") or {}).items():
+        answers[f"version.{key}"] = str(value)
+    for key in ("release", "target"):
+        if value := spec.get(key):
+            answers[key] = value
+    answers.update(spec.get("answers") or {})
+
+    job_id = uuid.uuid4().hex[:12]
+    return {
+        "id": job_id,
+        "product": product,
+        "answers": answers,
+        "private_branch_name": f"private-{config.KERBEROS_USERNAME}-{job_id}",
+        "resume": False,
+        "status": QUEUED,
+        "cancel_requested": False,
+        "created": time.time(),
+        "started": None,
+        "finished": None,
+        "returncode": None,
+    }
+
+
+class BuildService:
+    def __init__(self, store, workers=None):
+        self.store = store
+        self.workers = workers or config.SERVICE_WORKERS
+        self.pending = []
+        self.processes = {}
+        # jobs for one product share its repo, so run them in turn; a worker
+        # takes the oldest queued job whose product is not already building
+        self.busy_products = set()
+        self.condition = threading.Condition()
+
+    def start(self):
+        for job in self.store.all():
+            if job["status"] == RUNNING:
+                # interrupted by a service restart; pick up from its checkpoint
+                job = self.store.update(job["id"], status=QUEUED, resume=True)
+            if job["status"] == QUEUED:
+                self.enqueue(job["id"])
+        for number in range(self.workers):
+            threading.Thread(
+                target=self.work, name=f"build-worker-{number}", daemon=True
+            ).start()
+
+    def stop(self):
+        for process in list(self.processes.values()):
+            os.killpg(process.pid, signal.SIGTERM)
+
+    def submit(self, spec):
+        job = new_job(spec)
+        self.store.save(job)
+        self.enqueue(job["id"])
+        return job
+
+    def enqueue(self, job_id):
+        with self.condition:
+            self.pending.append(job_id)
+            self.condition.notify_all()
+
+    def next_job(self):
+        """Wait for the oldest queued job whose product is free, and claim it."""
+        with self.condition:
+            while True:
+                for job_id in list(self.pending):
+                    job = self.store.load(job_id)
+                    if not job or job["status"] != QUEUED:
+                        self.pending.remove(job_id)  # e.g. cancelled while queued
+                    elif job["product"] not in self.busy_products:
+                        self.pending.remove(job_id)
+                        self.busy_products.add(job["product"])
+                        return job
+                self.condition.wait()
+
+    def cancel(self, job_id):
+        process = None
+        with self.store.lock:
+            if not (job := self.store.load(job_id)):
+                return None
+            if job["status"] == QUEUED:
+                return self.store.update(job_id, status=CANCELLED, finished=time.time())
+            if job["status"] == RUNNING:
+                job = self.store.update(job_id, cancel_requested=True)
+                process = self.processes.get(job_id)
+        if process:
+            os.killpg(process.pid, signal.SIGTERM)
+        return job
+
+    def work(self):
+        while True:
+            job = self.next_job()
+            try:
+                self.run(job["id"])
+            except Exception as e:  # noqa: BLE001 - never leave a job running
+                warning(f"Job {job['id']} could not run: {e}")
+                self.store.update(job["id"], status=FAILED, finished=time.time())
+            finally:
+                with self.condition:
+                    self.busy_products.discard(job["product"])
+                    self.condition.notify_all()
+
+    def run(self, job_id):
+        # claim the job only if it was not cancelled since next_job saw it
+        if not self.store.transition(
+            job_id, QUEUED, status=RUNNING, started=time.time()
+        ):
+            return
+        with self.store.log_path(job_id).open("ab") as log_file:
+            process = subprocess_popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "discobuilder",
+                    "job",
+                    str(self.store.job_path(job_id)),
+                ],
+                stdin=DEVNULL,
+                stdout=log_file,
+                stderr=STDOUT,
+                start_new_session=True,
+            )
+            self.processes[job_id] = process
+            if self.store.load(job_id)["cancel_requested"]:
+                os.killpg(process.pid, signal.SIGTERM)
+            returncode = process.wait()
+            del self.processes[job_id]
+
+        job = self.store.load(job_id)
+        if job["cancel_requested"]:
+            status = CANCELLED
+        else:
+            status = SUCCEEDED if returncode == 0 else FAILED
+        self.store.update(
+            job_id, status=status, returncode=returncode, finished=time.time()
+        )
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def send_json(self, status, body):
+        payload = json.dumps(body, indent=2).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_not_found(self):
+        self.send_json(HTTPStatus.NOT_FOUND, {"error": "not found"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if re.fullmatch(r"/jobs/?", url.path):
+            return self.send_json(HTTPStatus.OK, self.service.store.all())
+        if (match := re.fullmatch(r"/jobs/(\w+)", url.path)) and (
+            job := self.service.store.load(match.group(1))
+        ):
+            return self.send_json(HTTPStatus.OK, job)
+        if (
+            match := re.fullmatch(r"/jobs/(\w+)/log", url.path)
+        ) and self.service.store.load(match.group(1)):
+            return self.send_log(match.group(1), parse_qs(url.query))
+        self.send_not_found()
+
+    def send_log(self, job_id, query):
+        offset = query.get("offset", ["0"])[0]
+        if not offset.isdigit():
+            return self.send_json(
+                HTTPStatus.BAD_REQUEST, {"error": "'offset' must be a whole number"}
+            )
+        offset = int(offset)
+        try:
+            with self.service.store.log_path(job_id).open("rb") as log_file:
+                log_file.seek(offset)
+                payload = log_file.read()
+        except FileNotFoundError:
+            payload = b""
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("X-Log-Offset", str(offset + len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if re.fullmatch(r"/jobs/?", path):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                job = self.service.submit(json.loads(self.rfile.read(length) or b"{}"))
+            except (JobError, ValueError) as e:
+                return self.send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+            return self.send_json(HTTPStatus.CREATED, job)
+        if match := re.fullmatch(r"/jobs/(\w+)/cancel", path):
+            return self.cancel(match.group(1))
+        self.send_not_found()
+
+    def do_DELETE(self):
+        if match := re.fullmatch(r"/jobs/(\w+)", urlparse(self.path).path):
+            return self.cancel(match.group(1))
+        self.send_not_found()
+
+    def cancel(self, job_id):
+        if job := self.service.cancel(job_id):
+            return self.send_json(HTTPStatus.OK, job)
+        self.send_not_found()
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host=None, port=None, socket_path=None):
+    handler = type("Handler", (ServiceRequestHandler,), {"service": service})
+    if socket_path:
+        Path(socket_path).unlink(missing_ok=True)
+        return UnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host=None, port=None, socket_path=None, workers=None):
+    from discobuilder.adapter.git import configure_git
+    from discobuilder.adapter.kerberos import start_ticket_manager
+
+    discobuilder.interactive = False
+    configure_git()
+    if subprocess_call([config.KLIST_COMMAND, "-s"]) != 0:
+        warning("No Kerberos ticket found; jobs will fail until you kinit.")
+    start_ticket_manager()
+
+    service = BuildService(JobStore(config.SERVICE_DIR), workers)
+    service.start()
+    socket_path = socket_path if socket_path is not None else config.SERVICE_SOCKET
+    server = make_server(
+        service,
+        host or config.SERVICE_HOST,
+        port or config.SERVICE_PORT,
+        socket_path,
+    )
+    where = (
+        socket_path or f"http://{server.server_address[0]}:{server.server_address[1]}"
+    )
+    console.print(f"discobuilder service listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+        if socket_path:
+            Path(socket_path).unlink(missing_ok=True)
+
+
+def run_job(job_path):
+    """Run one service job's pipeline non-interactively (in a child process)."""
+    from discobuilder.adapter.kerberos import start_ticket_manager
+
+    with open(job_path, "r") as job_file:
+        job = json.load(job_file)
+    discobuilder.interactive = False
+    discobuilder.answers.update(job["answers"])
+    config.PRIVATE_BRANCH_NAME = job["private_branch_name"]
+    # resume only this job's own progress, never another run of the product
+    config.CHECKPOINT_DIR = str(Path(config.CHECKPOINT_DIR) / "jobs" / job["id"])
+    config.RESUME = job["resume"]
+    console.rule(f"job {job['id']}: {job['product']}")
+    # pause remote commands while the ticket is expired instead of failing them
+    start_ticket_manager()
+    get_builder(job["product"])()
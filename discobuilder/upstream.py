@@ -0,0 +1,191 @@
+"""
+Find the latest upstream releases for discovery-server's sources-version.yaml.
+
+Each key in sources-version.yaml names an upstream component. Its release tags
+are listed with `git ls-remote` (all components concurrently, no clones), and
+kept in a small cache so repeated builds do not hit the network each time.
+The chosen values are written back by replacing only the changed scalars, so
+comments, ordering, and quoting in the file are left as they were.
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from pathlib import Path
+
+from discobuilder import config, console, metrics
+from discobuilder.adapter.git import GitListRemoteFailure, list_remote_tags
+from discobuilder.lock import get_lock
+
+RELEASE_TAG = re.compile(r"v?(\d+(?:\.\d+)*)")
+TOP_LEVEL_SCALAR = re.compile(
+    r"^(?P<key>[\w.-]+)(?P<separator>\s*:\s*)"
+    r"(?P<quote>['\"]?)(?P<value>[^'\"#]*?)(?P=quote)(?P<rest>\s*(?:#.*)?)$"
+)
+
+
+class SourcesYamlFailure(Exception):
+    pass
+
+
+def upstream_url(key):
+    if config.SOURCES_UPSTREAM_MIRROR_DIR:
+        return str(Path(config.SOURCES_UPSTREAM_MIRROR_DIR) / f"{key}.git")
+    if url := config.SOURCES_UPSTREAM_GIT_URLS.get(key):
+        return url
+    return config.SOURCES_UPSTREAM_GIT_URL_TEMPLATE.format(key=key)
+
+
+def load_tag_cache():
+    try:
+        with open(config.TAG_CACHE_PATH, "r") as cache_file:
+            return json.load(cache_file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_tag_cache(cache):
+    cache_path = Path(config.TAG_CACHE_PATH)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cache_path.with_suffix(".tmp")
+    with temp_path.open("w") as cache_file:
+        json.dump(cache, cache_file, indent=2)
+    os.replace(temp_path, cache_path)
+
+
+def get_remote_tags(url, save_cache=True):
+    """List a remote's tags, reusing cached tags younger than the TTL."""
+    cached = load_tag_cache().get(url)
+    if cached and time.time() - cached["fetched"] < config.TAG_CACHE_TTL_SECONDS:
+        metrics.record("cache_hit", 1, cache="tags")
+        return cached["tags"]
+    metrics.record("cache_hit", 0, cache="tags")
+    tags = list_remote_tags(url)
+    if not save_cache:
+        return tags
+    with get_lock("tag-cache").acquire():
+        cache = load_tag_cache()
+        cache[url] = {"fetched": time.time(), "tags": tags}
+        save_tag_cache(cache)
+    return tags
+
+
+def version_tuple(version):
+    if match := RELEASE_TAG.fullmatch(str(version)):
+        return tuple(int(part) for part in match.group(1).split("."))
+    return None
+
+
+def latest_release(tags):
+    """Return the highest plain release tag (e.g. 1.4.3 or v1.4.3), if any."""
+    releases = [tag for tag in tags if version_tuple(tag)]
+    return max(releases, key=version_tuple, default=None)
+
+
+def propose_version(key, current, save_cache=True):
+    """
+    Return (latest tag, proposed value, note) for one sources-version.yaml key.
+
+    The proposal keeps the current value's style (with or without a "v"), and
+    never goes backwards; values that are not versions are left alone.
+    """
+    if not (current_version := version_tuple(current)):
+        return None, None, "not a release version"
+    latest = latest_release(get_remote_tags(upstream_url(key), save_cache))
+    if not latest:
+        return None, None, "no release tags"
+    if version_tuple(latest) <= current_version:
+        return latest, None, "up to date"
+    proposed = latest.removeprefix("v")
+    if str(current).startswith("v"):
+        proposed = f"v{proposed}"
+    return latest, proposed, ""
+
+
+def resolve_versions(sources_versions, save_cache=True):
+    """Look up every key's latest upstream release concurrently."""
+    keys = list(sources_versions)
+    with ThreadPoolExecutor(max_workers=max(len(keys), 1)) as executor:
+        futures = {
+            # keep the pipeline's metrics labels in the pool's threads
+            key: executor.submit(
+                copy_context().run,
+                propose_version,
+                key,
+                sources_versions[key],
+                save_cache,
+            )
+            for key in keys
+        }
+    resolved = {}
+    for key, future in futures.items():
+        try:
+            resolved[key] = future.result()
+        except (GitListRemoteFailure, OSError) as e:
+            resolved[key] = (None, None, f"{type(e).__name__}: {e}")
+    return resolved
+
+
+def show_proposals(sources_versions, resolved):
+    from rich.table import Table
+
+    table = Table("key", "current", "latest tag", "proposed", "note")
+    for key, (latest, proposed, note) in resolved.items():
+        table.add_row(
+            key,
+            str(sources_versions[key]),
+            latest or "",
+            f"[green]{proposed}[/green]" if proposed else "",
+            note,
+            style=None if proposed else "bright_black",
+        )
+    console.print(table)
+
+
+def render_scalar(value, quote):
+    import yaml
+
+    if quote == "'" and "'" not in value or quote == '"' and '"' not in value:
+        return f"{quote}{value}{quote}"
+    # only drop quotes when YAML reads the value back as the same string,
+    # e.g. 1.10 would otherwise load as the float 1.1
+    if str(yaml.safe_load(f"key: {value}")["key"]) == value:
+        return value
+    return json.dumps(value)
+
+
+def replace_scalars(text, changes):
+    """Replace top-level scalar values by key, leaving every other line as-is."""
+    import yaml
+
+    remaining = dict(changes)
+    lines = text.splitlines(keepends=True)
+    for number, line in enumerate(lines):
+        body = line.rstrip("\r\n")
+        match = TOP_LEVEL_SCALAR.match(body)
+        if not match or match.group("key") not in remaining:
+            continue
+        value = remaining.pop(match.group("key"))
+        lines[number] = "".join(
+            (
+                match.group("key"),
+                match.group("separator"),
+                render_scalar(value, match.group("quote")),
+                match.group("rest"),
+                line[len(body) :],
+            )
+        )
+    if remaining:
+        raise SourcesYamlFailure(
+            f"Could not find simple values to replace for {', '.join(remaining)}"
+        )
+
+    new_text = "".join(lines)
+    loaded = yaml.safe_load(new_text)
+    for key, value in changes.items():
+        if str(loaded.get(key)) != value:
+            raise SourcesYamlFailure(f"Failed to set '{key}' to '{value}'")
+    return new_text
@@ -0,0 +1,124 @@
+"""
+Check an edited spec file and its freshly built SRPM before any remote work.
+
+Bad %global values or a bad Version: otherwise only show up after a push and a
+brew scratch build. These checks only read local files, so they run in the
+background while the operator writes the commit message, and the pipeline
+stops before `rhpkg import` if any of them fail.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from discobuilder.adapter import rpmbuild
+from discobuilder.checkpoint import file_digest
+from discobuilder.preflight import FAILED, OK, WARNING, run_check, show_report
+
+# dist-git `sources` lines look like "SHA512 (name) = digest" or "digest  name"
+SOURCES_LINE_BSD = re.compile(
+    r"^(?P<algorithm>\w+) \((?P<name>.+)\) = (?P<digest>\w+)$"
+)
+SOURCES_LINE_MD5 = re.compile(r"^(?P<digest>[0-9a-f]{32})\s+(?P<name>.+)$")
+
+
+class PackageValidationFailure(Exception):
+    pass
+
+
+def read_sources_file(sources_path):
+    """Return {name: (algorithm, digest)} from a dist-git `sources` file."""
+    entries = {}
+    try:
+        lines = Path(sources_path).read_text().splitlines()
+    except FileNotFoundError:
+        return entries
+    for line in lines:
+        if match := SOURCES_LINE_BSD.match(line.strip()):
+            entries[match.group("name")] = (
+                match.group("algorithm").lower(),
+                match.group("digest"),
+            )
+        elif match := SOURCES_LINE_MD5.match(line.strip()):
+            entries[match.group("name")] = ("md5", match.group("digest"))
+    return entries
+
+
+def check_spec_parses(specfile_path):
+    rpmbuild.parse_spec(specfile_path)
+    name, version, release = rpmbuild.query_spec_nvr(specfile_path)
+    return OK, f"{name}-{version}-{release}"
+
+
+def check_srpm_matches_spec(specfile_path, srpm_path):
+    spec_nvr = rpmbuild.query_spec_nvr(specfile_path)
+    srpm_nvr = rpmbuild.query_srpm_nvr(srpm_path)
+    expected_name = f"{'-'.join(spec_nvr)}.src.rpm"
+    if srpm_nvr != spec_nvr:
+        return FAILED, f"SRPM is {'-'.join(srpm_nvr)}, spec is {'-'.join(spec_nvr)}"
+    if Path(srpm_path).name != expected_name:
+        return FAILED, f"SRPM is named {Path(srpm_path).name}, not {expected_name}"
+    return OK, expected_name
+
+
+def check_srpm_sources(specfile_path, srpm_path):
+    srpm_files = set(rpmbuild.list_srpm_files(srpm_path))
+    sources = rpmbuild.list_spec_sources(specfile_path)
+    if missing := [name for name in sources if name not in srpm_files]:
+        return FAILED, f"missing from the SRPM: {', '.join(missing)}"
+    return OK, f"all {len(sources)} sources are in the SRPM"
+
+
+def check_sources_file(specfile_path, repo_path):
+    """
+    Compare dist-git's `sources` file with the spec's Source entries.
+
+    `rhpkg import` rewrites the file, so entries for old sources are expected,
+    but a source that keeps its name while its content changes is suspicious.
+    """
+    entries = read_sources_file(Path(repo_path) / "sources")
+    sources = rpmbuild.list_spec_sources(specfile_path)
+    changed = []
+    for name in sources:
+        if name not in entries:
+            continue
+        algorithm, digest = entries[name]
+        local_digest = file_digest(rpmbuild.get_sources_path() / name, algorithm)
+        if local_digest and local_digest != digest:
+            changed.append(name)
+    if changed:
+        return WARNING, f"content changed under the same name: {', '.join(changed)}"
+    new = [name for name in sources if name not in entries]
+    stale = [name for name in entries if name not in sources]
+    return OK, f"{len(new)} new, {len(stale)} replaced by rhpkg import"
+
+
+def validate_package(specfile_path, srpm_path, repo_path):
+    checks = [
+        ("spec parses", check_spec_parses, (specfile_path,)),
+        ("SRPM matches spec", check_srpm_matches_spec, (specfile_path, srpm_path)),
+        ("SRPM has sources", check_srpm_sources, (specfile_path, srpm_path)),
+        ("sources file", check_sources_file, (specfile_path, repo_path)),
+    ]
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        futures = [executor.submit(run_check, *check) for check in checks]
+        return [future.result() for future in futures]
+
+
+def start_validation(specfile_path, srpm_path, repo_path):
+    """Start validating in the background and return a Future for the results."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="validation")
+    future = executor.submit(validate_package, specfile_path, srpm_path, repo_path)
+    executor.shutdown(wait=False)
+    return future
+
+
+def finish_validation(future):
+    """Wait for validation, show its report, and raise if any check failed."""
+    results = future.result()
+    show_report(results, title="Package validation")
+    if failed := [result.name for result in results if result.status == FAILED]:
+        raise PackageValidationFailure(
+            f"Package validation failed: {', '.join(failed)}"
+        )
+    return {"warnings": [r.name for r in results if r.status == WARNING]}
@@ -17,4 +17,9 @@ chmod 700 ~/.ssh
 echo "$KNOWN_HOSTS" >> ~/.ssh/known_hosts
 chmod 644 ~/.ssh/known_hosts
 
+export CACHE_ARCHIVE
+if [ -f "${CACHE_ARCHIVE:=/cache/discobuilder-cache.tar.gz}" ]; then
+    /usr/bin/python3 -m discobuilder cache import "$CACHE_ARCHIVE"
+fi
+
 /usr/bin/python3 -m discobuilder
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Measure how long discobuilder takes to reach its first interactive prompt.
+
+Each run starts a fresh interpreter, so module imports are never warm. The
+first prompt is intercepted and the process exits. Prefetching and metrics are
+turned off, so no repos are cloned or fetched and nothing is recorded.
+
+    python3 scripts/startup_benchmark.py [--runs N] [--importtime]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PROBE_ENV = {**os.environ, "PREFETCH": "0", "METRICS": "0"}
+
+PROBE = """
+import time
+started = time.perf_counter()
+
+import rich.prompt
+
+def first_prompt(*args, **kwargs):
+    print(f"{time.perf_counter() - started:.6f}")
+    raise SystemExit(0)
+
+rich.prompt.Prompt.ask = first_prompt
+
+from discobuilder.builder import build
+build()
+"""
+
+
+def time_to_first_prompt():
+    probe = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=REPO_ROOT,
+        env=PROBE_ENV,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(probe.stdout.strip().splitlines()[-1])
+
+
+def show_slowest_imports(limit=15):
+    probe = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=REPO_ROOT,
+        env=PROBE_ENV,
+        capture_output=True,
+        text=True,
+    )
+    timings = []
+    for line in probe.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        timings.append((int(cumulative_us), name.rstrip()))
+    for cumulative_us, name in sorted(timings, reverse=True)[:limit]:
+        print(f"{cumulative_us / 1000:9.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--importtime", action="store_true", help="also list the slowest imports"
+    )
+    args = parser.parse_args()
+
+    samples = [time_to_first_prompt() for _ in range(args.runs)]
+    print(
+        f"time to first prompt over {args.runs} runs: "
+        f"median {statistics.median(samples) * 1000:.1f} ms, "
+        f"min {min(samples) * 1000:.1f} ms, "
+        f"max {max(samples) * 1000:.1f} ms"
+    )
+    if args.importtime:
+        show_slowest_imports()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from discobuilder import config
+from discobuilder.adapter import kerberos
+
+TIME_FORMAT = "%m/%d/%Y %H:%M:%S"
+
+KLIST_SCRIPT = """#!/bin/sh
+[ -f "{ticket}" ] || exit 1
+cat "{ticket}"
+"""
+
+KINIT_SCRIPT = """#!/bin/sh
+echo "$@" >> "{calls}"
+[ -f "{renewed}" ] || exit 1
+cp "{renewed}" "{ticket}"
+"""
+
+
+def klist_output(expires, renew_until=None):
+    started = expires - timedelta(hours=10)
+    lines = [
+        "Ticket cache: FILE:/tmp/krb5cc_test",
+        "Default principal: someone@EXAMPLE.COM",
+        "",
+        "Valid starting       Expires              Service principal",
+        f"{started.strftime(TIME_FORMAT)}  {expires.strftime(TIME_FORMAT)}"
+        "  krbtgt/EXAMPLE.COM@EXAMPLE.COM",
+    ]
+    if renew_until:
+        lines.append(f"\trenew until {renew_until.strftime(TIME_FORMAT)}")
+    return "\n".join(lines) + "\n"
+
+
+class StubKerberos:
+    """Stub klist and kinit scripts that share a fake credential cache."""
+
+    def __init__(self, directory):
+        self.ticket = directory / "ticket"
+        self.renewed = directory / "renewed"
+        self.calls = directory / "calls"
+        self.klist = directory / "klist"
+        self.kinit = directory / "kinit"
+        self.klist.write_text(KLIST_SCRIPT.format(ticket=self.ticket))
+        self.kinit.write_text(
+            KINIT_SCRIPT.format(
+                calls=self.calls, renewed=self.renewed, ticket=self.ticket
+            )
+        )
+        self.klist.chmod(0o755)
+        self.kinit.chmod(0o755)
+
+    def set_ticket(self, expires, renew_until=None):
+        self.ticket.write_text(klist_output(expires, renew_until))
+
+    def set_renewed_ticket(self, expires, renew_until=None):
+        self.renewed.write_text(klist_output(expires, renew_until))
+
+    def kinit_calls(self):
+        return self.calls.read_text().splitlines() if self.calls.exists() else []
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    stub = StubKerberos(tmp_path)
+    monkeypatch.setattr(config, "KLIST_COMMAND", str(stub.klist))
+    monkeypatch.setattr(config, "KINIT_COMMAND", str(stub.kinit))
+    monkeypatch.setattr(kerberos, "ticket_manager", None)
+    return stub
+
+
+def now():
+    return datetime.now().replace(microsecond=0)
+
+
+def test_get_ticket_times_parses_expiry_and_renewal(stub):
+    expires, renew_until = now() + timedelta(hours=8), now() + timedelta(days=7)
+    stub.set_ticket(expires, renew_until)
+
+    assert kerberos.get_ticket_times() == kerberos.TicketTimes(expires, renew_until)
+
+
+def test_get_ticket_times_without_a_ticket(stub):
+    assert kerberos.get_ticket_times() is None
+
+
+def test_refresh_leaves_a_fresh_ticket_alone(stub):
+    stub.set_ticket(now() + timedelta(hours=8), now() + timedelta(days=7))
+    manager = kerberos.TicketManager(renew_before=1800)
+
+    assert manager.refresh()
+    assert manager.ticket_ready.is_set()
+    assert stub.kinit_calls() == []
+
+
+def test_refresh_renews_a_ticket_that_expires_soon(stub):
+    renew_until = now() + timedelta(days=7)
+    stub.set_ticket(now() + timedelta(minutes=10), renew_until)
+    renewed_expires = now() + timedelta(hours=10)
+    stub.set_renewed_ticket(renewed_expires, renew_until)
+    manager = kerberos.TicketManager(renew_before=1800)
+
+    assert manager.refresh()
+    assert stub.kinit_calls() == ["-R"]
+    assert kerberos.get_ticket_times().expires == renewed_expires
+
+
+def test_remote_operations_pause_until_a_ticket_is_usable(stub):
+    # expired and no longer renewable: only a new kinit helps
+    stub.set_ticket(now() - timedelta(minutes=1), now() - timedelta(minutes=1))
+    manager = kerberos.TicketManager(renew_before=1800)
+    assert not manager.refresh()
+    kerberos.ticket_manager = manager
+
+    fetched = threading.Event()
+    fetch = kerberos.requires_ticket(fetched.set)
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+    thread.join(timeout=0.5)
+    assert thread.is_alive()
+    assert not fetched.is_set()
+
+    # the operator runs kinit, and the manager's next poll notices
+    stub.set_ticket(now() + timedelta(hours=10), now() + timedelta(days=7))
+    assert manager.refresh()
+    thread.join(timeout=5)
+    assert fetched.is_set()